@@ -1,16 +1,21 @@
 import customtkinter as ctk
+import queue
 import threading
 from tkinter import messagebox
 
-from twitter_client import post_tweet
-from reddit_client import post_reddit
-from gemini_client import generate_post_from_prompt, refine_text_for_twitter, refine_text_for_reddit
-from scraper.fetcher import fetch_techcrunch_ai
+from publish_queue import URGENT, get_default_queue
+from publisher import drafts_for, publish, split_results
+from gemini_client import generate_post_from_prompt, stream_refine_text, clean_refined_text, fit_draft
+from text_fit import weighted_length
+from scraper.enrich import enrich_article, enrich_articles
+from scraper.fetcher import fetch_ai_news
+from scraper.seen_index import POSTED, REFINED, get_default_index
 
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("green")
 X_CHARACTER_LIMIT = 280
 reddit_CHARACTER_LIMIT = 300
+UI_POLL_MS = 30  # how often queued widget updates from worker threads are applied
 
 class App(ctk.CTk):
     def __init__(self):
@@ -18,6 +23,8 @@ class App(ctk.CTk):
         self.title("AI Tweet Co-Pilot v4.0")
         self.geometry("800x1000")
         self.grid_columnconfigure(0, weight=1)
+        # Widget updates from worker threads; only the Tk main loop touches the widgets
+        self.ui_queue = queue.Queue()
 
         self.main_label = ctk.CTkLabel(self, text="AI Tweet Co-Pilot", font=ctk.CTkFont(size=28, weight="bold"))
         self.main_label.grid(row=0, column=0, padx=20, pady=(20, 10))
@@ -28,10 +35,11 @@ class App(ctk.CTk):
         self.article_listbox = ctk.CTkComboBox(self, values=[], width=700)
         self.article_listbox.grid(row=2, column=0, padx=20, pady=5)
 
-        self.generate_button = ctk.CTkButton(self, text="Send to Editor", command=self.send_article_to_editor)
+        self.generate_button = ctk.CTkButton(self, text="Send to Editor", command=self.run_send_thread)
         self.generate_button.grid(row=3, column=0, padx=20, pady=10)
 
         self.articles = []
+        self.current_article = None
         self.populate_articles()
 
         self.edit_label = ctk.CTkLabel(self, text="2. Edit Your Draft Here:", font=ctk.CTkFont(size=16, weight="bold"))
@@ -76,23 +84,40 @@ class App(ctk.CTk):
         self.status_textbox = ctk.CTkTextbox(self, height=100, state="disabled")
         self.status_textbox.grid(row=12, column=0, padx=20, pady=10, sticky="nsew")
 
+        self.after(UI_POLL_MS, self._drain_ui_queue)
+
     def populate_articles(self):
         try:
-            self.articles = fetch_techcrunch_ai()
+            self.articles = fetch_ai_news()
             titles = [a['title'] for a in self.articles]
             self.article_listbox.configure(values=titles)
             if titles:
                 self.article_listbox.set(titles[0])
+            # Download and summarize the articles in the background, so "Send to Editor" finds them in the article cache.
+            threading.Thread(target=enrich_articles, args=(self.articles,), daemon=True).start()
         except Exception as e:
             self.show_error_popup("Article Fetch Failed", str(e))
 
-    def send_article_to_editor(self):
-        idx = self.article_listbox.cget("values").index(self.article_listbox.get())
-        article = self.articles[idx]
-        content = f"{article['title']}\n\n{article.get('summary', '')}"
+    def send_article_to_editor(self, article):
+        try:
+            try:
+                article = enrich_article(article)
+            except Exception as e:
+                self.call_in_ui(self.update_status, f"Could not load the article text, sending the title only ({e}).")
+            content = f"{article['title']}\n\n{article.get('summary', '')}"
+            self.call_in_ui(self._set_editor, content)
+            self.call_in_ui(self.update_status, f"Article '{article['title']}' sent to editor.")
+        finally:
+            self.call_in_ui(self.lock_buttons, False)
+
+    def _set_editor(self, text):
         self.content_textbox.delete("1.0", "end")
-        self.content_textbox.insert("0.0", content)
-        self.update_status(f"Article '{article['title']}' sent to editor.")
+        self.content_textbox.insert("0.0", text)
+
+    def mark_current_article(self, stage):
+        """Remembers that the article in the editor reached `stage`, so later fetches can skip it."""
+        if self.current_article:
+            get_default_index().mark(self.current_article['url'], stage)
 
     def update_status(self, message):
         self.status_textbox.configure(state="normal")
@@ -101,12 +126,13 @@ class App(ctk.CTk):
         self.status_textbox.see("end")
 
     def show_error_popup(self, title, message):
-        self.after(0, messagebox.showerror, title, message)
-        self.update_status(f"🔴 ERROR: {title} - {message}")
+        """Safe from any thread: the main loop shows the status line, then the popup."""
+        self.call_in_ui(self.update_status, f"🔴 ERROR: {title} - {message}")
+        self.call_in_ui(messagebox.showerror, title, message)
 
     def update_preview_char_count(self):
         content = self.preview_textbox.get("1.0", "end-1c")
-        char_count = len(content)
+        char_count = weighted_length(content)  # X's count: URLs are 23, CJK and emoji 2
         contect_reddit = self.reddit_preview_textbox.get("1.0", "end-1c")
         char_count_reddit = len(contect_reddit)
         self.char_count_label.configure(text=f"{char_count} / {X_CHARACTER_LIMIT}")
@@ -121,64 +147,154 @@ class App(ctk.CTk):
         if is_working:
             self.post_button.configure(state="disabled")
 
-    def _run_threaded_task(self, task_function):
+    def _run_threaded_task(self, task_function, *args):
         self.lock_buttons(True)
-        thread = threading.Thread(target=task_function)
+        thread = threading.Thread(target=task_function, args=args)
         thread.start()
 
-    def run_refine_thread(self): self._run_threaded_task(self._refine_logic)
-    def run_post_thread(self): self._run_threaded_task(self._post_logic)
+    # The run_* handlers run on the Tk thread: they read the widgets there and hand
+    # the workers plain values; the workers update widgets only through call_in_ui().
+    def run_send_thread(self):
+        titles = self.article_listbox.cget("values")
+        if self.article_listbox.get() not in titles:
+            self.show_error_popup("No Article Selected", "Pick an article from the list first.")
+            return
+        self.current_article = self.articles[titles.index(self.article_listbox.get())]
+        self._run_threaded_task(self.send_article_to_editor, self.current_article)
+
+    def run_refine_thread(self):
+        self._run_threaded_task(self._refine_logic, self.content_textbox.get("1.0", "end-1c"))
+
+    def run_post_thread(self):
+        self._run_threaded_task(self._post_logic, self.preview_textbox.get("1.0", "end-1c"),
+                                self.reddit_preview_textbox.get("1.0", "end-1c"),
+                                self.content_textbox.get("1.0", "end-1c"))
+
+    def call_in_ui(self, func, *args, **kwargs):
+        """Queues a widget update from a worker thread; the Tk main loop applies it."""
+        self.ui_queue.put((func, args, kwargs))
+
+    def _drain_ui_queue(self):
+        try:
+            while True:
+                func, args, kwargs = self.ui_queue.get_nowait()
+                func(*args, **kwargs)
+        except queue.Empty:
+            pass
+        self.after(UI_POLL_MS, self._drain_ui_queue)
+
+    def _set_preview(self, textbox, text):
+        textbox.configure(state="normal")
+        textbox.delete("1.0", "end")
+        textbox.insert("0.0", text)
+        textbox.configure(state="disabled")
+        self.update_preview_char_count()
+
+    def _append_preview(self, textbox, chunk):
+        textbox.configure(state="normal")
+        textbox.insert("end", chunk)
+        textbox.configure(state="disabled")
+        textbox.see("end")
+        self.update_preview_char_count()
+
+    def _stream_to_preview(self, raw_text, platform, textbox, results):
+        """Streams one platform's refinement into its preview pane as the chunks arrive."""
+        try:
+            parts = []
+            # Refining the same text again is answered from the response cache
+            for chunk in stream_refine_text(raw_text, platform):
+                parts.append(chunk)
+                self.call_in_ui(self._append_preview, textbox, chunk)
+            results[platform] = clean_refined_text("".join(parts))
+            self.call_in_ui(self._set_preview, textbox, results[platform])
+        except Exception as e:
+            results[platform] = e
+            self.call_in_ui(self._set_preview, textbox, "")
 
-    def _refine_logic(self):
-        self.refine_button.configure(text="Refining...")
+    def _refine_logic(self, raw_text):
+        self.call_in_ui(self.refine_button.configure, text="Refining...")
         try:
-            raw_text = self.content_textbox.get("1.0", "end-1c")
             if not raw_text.strip():
                 raise ValueError("The edit box is empty. Please generate or write content first.")
-            refined_tweet = refine_text_for_twitter(raw_text)
-            refined_reddit = refine_text_for_reddit(raw_text)
-
-            self.preview_textbox.configure(state="normal")
-            self.preview_textbox.delete("1.0", "end")
-            self.preview_textbox.insert("0.0", refined_tweet)
-            self.preview_textbox.configure(state="disabled")
-
-            self.reddit_preview_textbox.configure(state="normal")
-            self.reddit_preview_textbox.delete("1.0", "end")
-            self.reddit_preview_textbox.insert("0.0", refined_reddit)
-            self.reddit_preview_textbox.configure(state="disabled")
 
-            self.update_status("AI refinement complete.")
-            self.update_preview_char_count()
-            if len(refined_tweet) <= X_CHARACTER_LIMIT:
-                self.post_button.configure(state="normal")
+            # Both platforms stream at the same time, each into its own pane.
+            results = {}
+            streams = []
+            for platform, textbox in (("twitter", self.preview_textbox), ("reddit", self.reddit_preview_textbox)):
+                self.call_in_ui(self._set_preview, textbox, "")
+                stream = threading.Thread(target=self._stream_to_preview, args=(raw_text, platform, textbox, results))
+                stream.start()
+                streams.append(stream)
+            for stream in streams:
+                stream.join()
+
+            errors = {p: r for p, r in results.items() if isinstance(r, Exception)}
+            if len(errors) == len(results):
+                raise RuntimeError("; ".join(f"{p}: {e}" for p, e in errors.items()))
+            for platform, error in errors.items():
+                self.show_error_popup(f"{platform.title()} Refinement Error", str(error))
+
+            # Over-long drafts are trimmed locally instead of asking the model again.
+            for platform, textbox in (("twitter", self.preview_textbox), ("reddit", self.reddit_preview_textbox)):
+                if platform in errors:
+                    continue
+                fitted = fit_draft(results[platform], platform)
+                if fitted.changed:
+                    results[platform] = fitted.text
+                    self.call_in_ui(self._set_preview, textbox, fitted.text)
+                    self.call_in_ui(self.update_status, f"✂️ Trimmed the {platform} draft to fit: {', '.join(fitted.changes)}")
+                    if fitted.truncated:
+                        self.call_in_ui(self.update_status, f"⚠️ The {platform} draft had to be cut mid-sentence; refine again for a cleaner version.")
+
+            refined_tweet = "" if "twitter" in errors else results["twitter"]
+            self.call_in_ui(self.update_status, "AI refinement complete.")
+            self.mark_current_article(REFINED)
+            if refined_tweet and weighted_length(refined_tweet) <= X_CHARACTER_LIMIT:
+                self.call_in_ui(self.post_button.configure, state="normal")
 
         except Exception as e:
             self.show_error_popup("Refinement Error", str(e))
         finally:
-            self.refine_button.configure(text="Refine & Preview")
-            self.lock_buttons(False)
+            self.call_in_ui(self.refine_button.configure, text="Refine & Preview")
+            self.call_in_ui(self.lock_buttons, False)
 
-    def _post_logic(self):
-        self.post_button.configure(text="Posting...")
+    def _post_logic(self, tweet, reddit_post, raw_text):
+        self.call_in_ui(self.post_button.configure, text="Posting...")
         try:
-            tweet = self.preview_textbox.get("1.0", "end-1c")
-            reddit_post = self.reddit_preview_textbox.get("1.0", "end-1c")
             if not tweet.strip():
                 raise ValueError("Tweet box is empty.")
-            if len(tweet) > X_CHARACTER_LIMIT:
+            if weighted_length(tweet) > X_CHARACTER_LIMIT:
                 raise ValueError("Tweet exceeds character limit.")
 
-            post_tweet(tweet)
-            post_reddit(reddit_post)
-            self.update_status("✅ Posted to X and Reddit successfully.")
-            self.after(5000, self.destroy)  # Close the application window after 3 seconds
+            backlog = get_default_queue().drain_estimate()
+            pending = sum(b["pending"] for b in backlog["endpoints"].values())
+            if pending:
+                self.call_in_ui(self.update_status, f"📮 {pending} scheduled posts are queued (~{backlog['seconds']:.0f}s); yours goes first.")
+
+            # Both platforms at once, journaled by content: pressing POST again
+            # after a partial failure only retries the missing side.
+            # Platforms without a preview pane get the text from the edit box.
+            # Someone is waiting on this one, so it jumps the scheduled posts.
+            _, results = publish(drafts_for({"twitter": tweet, "reddit": reddit_post}, raw_text), priority=URGENT)
+            posted, earlier, failed = split_results(results)
+            if failed:
+                details = "\n".join(f"{platform}: {results[platform].error}" for platform in failed)
+                retryable = [platform for platform in failed if results[platform].retryable]
+                hint = f"\n\nPress POST again to retry {', '.join(retryable)}." if retryable else ""
+                raise RuntimeError(f"Not everything was posted:\n{details}{hint}")
+            if not posted:
+                self.call_in_ui(self.update_status, "🟡 These drafts were already posted earlier; nothing new was sent.")
+                self.mark_current_article(POSTED)
+                return
+            self.call_in_ui(self.update_status, "✅ Posted to X and Reddit successfully.")
+            self.mark_current_article(POSTED)
+            self.call_in_ui(self.after, 5000, self.destroy)  # Close the application window after 5 seconds
 
         except Exception as e:
             self.show_error_popup("Posting Error", str(e))
         finally:
-            self.post_button.configure(text="POST TO X & REDDIT")
-            self.lock_buttons(False)
+            self.call_in_ui(self.post_button.configure, text="POST TO X & REDDIT")
+            self.call_in_ui(self.lock_buttons, False)
 
 if __name__ == "__main__":
     App().mainloop()
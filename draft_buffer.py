@@ -0,0 +1,136 @@
+# draft_buffer.py
+"""
+Buffer of ready-to-post drafts, so a scheduled post only has to dequeue and
+publish instead of waiting on Gemini at the moment the job fires.
+
+DraftBuffer is a bounded, persisted queue per key (one key per prompt/account).
+DraftPrefetcher tops it up during idle time; the scheduler runs it as its own job.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from env_config import CACHE_DIR
+from gemini_client import PLATFORM_CHARACTER_LIMITS, fit_draft, generate_post_from_prompt
+from publish_journal import new_nonce
+from text_fit import platform_length
+
+DEFAULT_BUFFER_PATH = CACHE_DIR / "drafts.json"
+DEFAULT_DEPTH = 3
+DEFAULT_MAX_AGE = 24 * 3600  # older drafts are thrown away rather than posted
+DEFAULT_REFILL_MINUTES = 5
+
+
+def is_postable(text, platform="twitter"):
+    return bool(text and text.strip()) and platform_length(text, platform) <= PLATFORM_CHARACTER_LIMITS[platform]
+
+
+class DraftBuffer:
+    def __init__(self, path=DEFAULT_BUFFER_PATH, depth=DEFAULT_DEPTH, max_age=DEFAULT_MAX_AGE):
+        self.path = Path(path)
+        self.depth = depth
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._queues = json.load(f)
+        except (OSError, ValueError):
+            self._queues = {}
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._queues, f)
+        os.replace(tmp_path, self.path)
+
+    def _drop_stale(self, key, now):
+        queue = self._queues.get(key, [])
+        fresh = [draft for draft in queue if now - draft["created_at"] <= self.max_age]
+        if len(fresh) != len(queue):
+            self._queues[key] = fresh
+            return True
+        return False
+
+    def put(self, key, text):
+        """Adds a draft; returns False if the queue for `key` is already full."""
+        with self._lock:
+            queue = self._queues.setdefault(key, [])
+            if len(queue) >= self.depth:
+                return False
+            queue.append({"text": text, "created_at": time.time(), "nonce": new_nonce()})
+            self._save()
+            return True
+
+    def pop(self, key):
+        """Oldest fresh draft for `key` as {"text", "created_at", "nonce"}, or None if empty."""
+        with self._lock:
+            changed = self._drop_stale(key, time.time())
+            queue = self._queues.get(key, [])
+            draft = queue.pop(0) if queue else None
+            if draft or changed:
+                self._save()
+            return draft
+
+    def missing(self, key):
+        with self._lock:
+            if self._drop_stale(key, time.time()):
+                self._save()
+            return self.depth - len(self._queues.get(key, []))
+
+    def stats(self):
+        """Queue depth and age of the oldest draft (seconds) per key, for monitoring."""
+        now = time.time()
+        with self._lock:
+            return {
+                key: {
+                    "depth": len(queue),
+                    "oldest_age_s": round(now - queue[0]["created_at"]) if queue else None,
+                }
+                for key, queue in self._queues.items()
+            }
+
+
+class DraftPrefetcher:
+    """
+    Fills a DraftBuffer from `prompts` ({key: prompt}). Drafts are generated
+    fresh (never from the response cache) and only validated drafts are queued.
+    """
+
+    def __init__(self, buffer, prompts, generate=generate_post_from_prompt, validate=is_postable):
+        self.buffer = buffer
+        self.prompts = prompts
+        self.generate = generate
+        self.validate = validate
+        self._refill_lock = threading.Lock()
+
+    def refill_once(self):
+        """Tops every queue up to its depth. Returns the number of drafts added."""
+        if not self._refill_lock.acquire(blocking=False):
+            return 0  # another refill is already running
+        added = 0
+        try:
+            for key, prompt in self.prompts.items():
+                attempts = self.buffer.missing(key) * 2  # a few rejects are fine, an endless loop is not
+                while attempts > 0 and self.buffer.missing(key) > 0:
+                    attempts -= 1
+                    text = self.generate(prompt, use_cache=False)
+                    if text:
+                        fitted = fit_draft(text, "twitter")
+                        if not fitted.truncated:
+                            text = fitted.text  # trimmed locally instead of regenerating
+                    if self.validate(text) and self.buffer.put(key, text):
+                        added += 1
+        finally:
+            self._refill_lock.release()
+        return added
+
+    def refill_in_background(self):
+        """Runs refill_once() on a daemon thread and returns it; join it before exiting to keep its drafts."""
+        thread = threading.Thread(target=self.refill_once, daemon=True)
+        thread.start()
+        return thread
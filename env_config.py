@@ -0,0 +1,56 @@
+# env_config.py
+"""
+Loads credentials from the .env file once per process and again only when the
+file changes, so API clients can be reused until their credentials rotate.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+from dotenv import find_dotenv, load_dotenv
+
+# Journal, draft buffer, feed and article caches all live here; BOT_CACHE_DIR
+# moves them together (the tests point it at a temporary directory).
+CACHE_DIR = Path(os.environ.get("BOT_CACHE_DIR") or Path(__file__).resolve().parent / ".cache")
+
+_lock = threading.Lock()
+_env_path = None
+_loaded_mtime = None
+
+
+def _find_env_file():
+    local = Path(__file__).resolve().parent / ".env"
+    if local.exists():
+        return str(local)
+    return find_dotenv(usecwd=True)
+
+
+def refresh_env():
+    """
+    Loads .env on the first call and reloads it whenever its modification time
+    changes. Cheap enough to call on every request (a single stat).
+    Returns True if the file was (re)loaded.
+    """
+    global _env_path, _loaded_mtime
+    with _lock:
+        if _env_path is None:
+            _env_path = _find_env_file() or ""
+        if not _env_path:
+            return False
+        try:
+            mtime = os.stat(_env_path).st_mtime
+        except OSError:
+            return False
+        if mtime == _loaded_mtime:
+            return False
+        # Values from the process environment win on the first load; on a
+        # reload the rotated values in the file must replace the old ones.
+        load_dotenv(_env_path, override=_loaded_mtime is not None)
+        _loaded_mtime = mtime
+        return True
+
+
+def get_env(name, default=None):
+    refresh_env()
+    return os.getenv(name, default)
@@ -0,0 +1,289 @@
+# fake_services.py
+"""
+Local stand-ins for the Gemini, X and Reddit APIs, so the bot can be
+load-tested without real credentials or real rate limits.
+
+Each FakeService is a small threaded HTTP server with configurable latency,
+error rate and a fixed-window rate limit that answers with the provider's own
+rate-limit headers. client_environment() returns the environment variables that
+point gemini_client, twitter_client and reddit_client at the fakes.
+"""
+
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+UNLIMITED_QUOTA = 1_000_000  # advertised in the headers when no rate limit is configured
+
+FAKE_DRAFT = (
+    "Keep learning, keep shipping. The tech industry rewards people who pick up new skills "
+    "before they need them, technical and soft alike. Stay curious! #AI #Upskilling #FutureOfWork"
+)
+
+
+@dataclass
+class FakeServiceConfig:
+    latency: float = 0.05  # mean seconds per response
+    jitter: float = 0.02  # +/- seconds, uniform
+    error_rate: float = 0.0  # share of requests answered with a 503
+    rate_limit: int = 0  # requests per window, 0 for no limit
+    window: float = 60.0  # rate-limit window in seconds
+
+
+class FakeService:
+    """One fake API ("gemini", "x" or "reddit") on 127.0.0.1 at a free port."""
+
+    def __init__(self, kind, config=None):
+        if kind not in _ROUTES:
+            raise ValueError(f"Unknown fake service: {kind}")
+        self.kind = kind
+        self.config = config or FakeServiceConfig()
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.connections = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._window_start = time.time()
+        self._window_used = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.service = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def next_id(self):
+        return next(self._ids)
+
+    def admit(self):
+        """
+        Counts one request against the current window.
+        Returns (outcome, limit_state): outcome is "ok", "error" or "throttled".
+        """
+        config = self.config
+        with self._lock:
+            self.requests += 1
+            now = time.time()
+            if now - self._window_start >= config.window:
+                self._window_start, self._window_used = now, 0
+            limit = config.rate_limit or UNLIMITED_QUOTA
+            limit_state = {"limit": limit, "reset_at": self._window_start + config.window}
+            if self._window_used >= limit:
+                self.throttled += 1
+                limit_state["used"], limit_state["remaining"] = limit, 0
+                return "throttled", limit_state
+            self._window_used += 1
+            limit_state["used"] = self._window_used
+            limit_state["remaining"] = limit - self._window_used
+            if random.random() < config.error_rate:
+                self.errors += 1
+                return "error", limit_state
+            return "ok", limit_state
+
+    def delay(self):
+        config = self.config
+        time.sleep(max(0.0, config.latency + random.uniform(-config.jitter, config.jitter)))
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "throttled": self.throttled,
+                    "connections": self.connections}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+    def setup(self):
+        super().setup()
+        service = self.server.service
+        with service._lock:
+            service.connections += 1
+
+    def log_message(self, format, *args):
+        pass  # keep load-test output readable
+
+    def do_POST(self):
+        service = self.server.service
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        for matches, handler in _ROUTES[service.kind]:
+            if matches(self.path):
+                handler(self, service, body)
+                return
+        self.send_json(404, {"error": f"No fake route for {self.path}"})
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+# --- Gemini: POST /v1beta/models/<model>:generateContent and :streamGenerateContent ---
+
+def _gemini_chunk(text, final):
+    chunk = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}]}
+    if final:
+        chunk["candidates"][0]["finishReason"] = "STOP"
+        tokens = len(FAKE_DRAFT) // 4
+        chunk["usageMetadata"] = {"promptTokenCount": 120, "candidatesTokenCount": tokens,
+                                  "totalTokenCount": 120 + tokens}
+    return chunk
+
+
+def _gemini_error(handler, outcome, limit_state):
+    if outcome == "throttled":
+        retry = max(1, round(limit_state["reset_at"] - time.time()))
+        handler.send_json(429, {"error": {"code": 429, "message": "Quota exceeded (fake).",
+                                          "status": "RESOURCE_EXHAUSTED"}},
+                          {"Retry-After": str(retry)})
+    else:
+        handler.send_json(503, {"error": {"code": 503, "message": "The model is overloaded (fake).",
+                                          "status": "UNAVAILABLE"}})
+
+
+def _gemini_generate(handler, service, body):
+    outcome, limit_state = service.admit()
+    service.delay()
+    if outcome != "ok":
+        _gemini_error(handler, outcome, limit_state)
+        return
+    # Uncached generations differ from call to call; numbering keeps the fake from repeating one post
+    handler.send_json(200, _gemini_chunk(f"Take {service.next_id()}: {FAKE_DRAFT}", final=True))
+
+
+def _gemini_stream(handler, service, body):
+    outcome, limit_state = service.admit()
+    if outcome != "ok":
+        service.delay()
+        _gemini_error(handler, outcome, limit_state)
+        return
+    # The REST transport reads a JSON array of responses as it arrives;
+    # the latency is spread over the chunks like a real stream.
+    words = FAKE_DRAFT.split(" ")
+    parts = [" ".join(words[i:i + 8]) + " " for i in range(0, len(words), 8)]
+    parts[-1] = parts[-1].rstrip()
+    handler.send_response(200)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Connection", "close")  # no Content-Length: the body ends when the connection does
+    handler.end_headers()
+    handler.close_connection = True
+    handler.wfile.write(b"[")
+    for i, part in enumerate(parts):
+        time.sleep(service.config.latency / len(parts))
+        prefix = b"," if i else b""
+        handler.wfile.write(prefix + json.dumps(_gemini_chunk(part, final=i == len(parts) - 1)).encode("utf-8"))
+        handler.wfile.flush()
+    handler.wfile.write(b"]")
+
+
+# --- X: POST /2/tweets ----------------------------------------------------------------
+
+def _x_create_tweet(handler, service, body):
+    outcome, limit_state = service.admit()
+    service.delay()
+    headers = {
+        "x-rate-limit-limit": str(limit_state["limit"]),
+        "x-rate-limit-remaining": str(limit_state["remaining"]),
+        "x-rate-limit-reset": str(math.ceil(limit_state["reset_at"])),
+    }
+    if outcome == "throttled":
+        handler.send_json(429, {"title": "Too Many Requests", "detail": "Too Many Requests", "status": 429}, headers)
+    elif outcome == "error":
+        handler.send_json(503, {"title": "Service Unavailable", "detail": "Service Unavailable", "status": 503}, headers)
+    else:
+        text = json.loads(body or b"{}").get("text", "")
+        tweet_id = str(1_800_000_000_000_000_000 + service.next_id())
+        handler.send_json(201, {"data": {"id": tweet_id, "text": text, "edit_history_tweet_ids": [tweet_id]}},
+                          headers)
+
+
+# --- Reddit: POST /api/v1/access_token and /api/submit -----------------------------------
+
+def _reddit_token(handler, service, body):
+    handler.send_json(200, {"access_token": "fake-token", "token_type": "bearer",
+                            "expires_in": 86400, "scope": "*"})
+
+
+def _reddit_submit(handler, service, body):
+    outcome, limit_state = service.admit()
+    service.delay()
+    headers = {
+        "x-ratelimit-used": str(limit_state["used"]),
+        "x-ratelimit-remaining": str(limit_state["remaining"]),
+        "x-ratelimit-reset": str(max(0, math.ceil(limit_state["reset_at"] - time.time()))),
+    }
+    if outcome == "throttled":
+        handler.send_json(429, {"message": "Too Many Requests", "error": 429}, headers)
+    elif outcome == "error":
+        handler.send_json(503, {"message": "Service Unavailable", "error": 503}, headers)
+    else:
+        post_id = format(service.next_id(), "x")
+        subreddit = parse_qs(body.decode("utf-8")).get("sr", ["test"])[0]
+        handler.send_json(200, {"json": {"errors": [], "data": {
+            "id": post_id, "name": f"t3_{post_id}", "drafts_count": 0,
+            "url": f"{service.url}/r/{subreddit}/comments/{post_id}/",
+        }}}, headers)
+
+
+_ROUTES = {
+    "gemini": [
+        (lambda path: ":streamGenerateContent" in path, _gemini_stream),
+        (lambda path: ":generateContent" in path, _gemini_generate),
+    ],
+    "x": [(lambda path: path.split("?")[0] == "/2/tweets", _x_create_tweet)],
+    "reddit": [
+        (lambda path: path.startswith("/api/v1/access_token"), _reddit_token),
+        (lambda path: path.split("?")[0].rstrip("/") == "/api/submit", _reddit_submit),
+    ],
+}
+
+
+def start_fake_services(configs=None):
+    """Starts the three fakes; `configs` maps a service name to its FakeServiceConfig."""
+    configs = configs or {}
+    return {kind: FakeService(kind, configs.get(kind)).start() for kind in ("gemini", "x", "reddit")}
+
+
+def stop_fake_services(services):
+    for service in services.values():
+        service.stop()
+
+
+def client_environment(services):
+    """Environment variables that point the bot's clients at `services`, with dummy credentials."""
+    return {
+        "GEMINI_API_KEY": "fake-gemini-key",
+        "GEMINI_API_ENDPOINT": services["gemini"].url,
+        "API_KEY": "fake", "API_KEY_SECRET": "fake",
+        "ACCESS_TOKEN": "fake", "ACCESS_TOKEN_SECRET": "fake",
+        "X_API_BASE_URL": services["x"].url,
+        "YOUR_CLIENT_ID": "fake", "YOUR_CLIENT_SECRET": "fake",
+        "YOUR_REDDIT_USERNAME": "fake", "YOUR_REDDIT_PASSWORD": "fake",
+        "REDDIT_OAUTH_URL": services["reddit"].url,
+        "REDDIT_URL": services["reddit"].url,
+        "REDDIT_SUBREDDIT_INTERVAL": "0",  # every fake post goes to r/test; pacing would serialize them
+    }
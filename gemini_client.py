@@ -1,63 +1,88 @@
 # gemini_client.py
 
-import os
+import asyncio
+import contextlib
+import hashlib
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
 import google.generativeai as genai
-from dotenv import load_dotenv
-# from scraper.techcrunch import fetch_techcrunch_ai
-from scraper.fetcher import fetch_techcrunch_ai
 
+import resilience
+from env_config import get_env
+from gemini_metrics import CACHE_HIT, CACHE_MISS, CACHE_OFF, CallRecord, get_metrics, usage_counts
+from rate_limit import TokenBucket
+from response_cache import ResponseCache, make_cache_key
+from text_fit import fit_for_platform, platform_length
 
-def generate_post_from_prompt(prompt):
-    """
-    Generates tweet text from a given prompt using the Gemini API.
-    """
-    # Load environment variables from .env file
-    load_dotenv()
-    gemini_key = os.getenv("GEMINI_API_KEY")
+DEFAULT_MODEL = 'gemini-2.0-flash'
+GEMINI_TIMEOUT = 60  # seconds per request, shortened by any resilience.deadline()
 
-    if not gemini_key:
-        print("🔴 Error: GEMINI_API_KEY not found in .env file.")
-        return None
+# Named generation configs; None keeps the model's defaults.
+GENERATION_PROFILES = {
+    "default": None,
+    "precise": {"temperature": 0.2},
+    "creative": {"temperature": 1.0},
+}
 
-    try:
-        # Configure the Gemini client with the API key
-        genai.configure(api_key=gemini_key)
 
-        # Create the model
-        model = genai.GenerativeModel('gemini-2.0-flash')
+class MissingAPIKeyError(ValueError):
+    pass
 
-        print("🔵 Sending prompt to Gemini AI...")
-        # Send the prompt to the model
-        response = model.generate_content(prompt)
-        
-        print("✅ Received response from Gemini.")
-        # Return the generated text, removing any potential markdown like asterisks
-        return response.text.strip().replace('*', '')
 
-    except Exception as e:
-        print(f"🔴 An error occurred with the Gemini API: {e}")
-        return None
-        raise e
-    
-    # In gemini_client.py, add this new function below the existing one.
-
-def refine_text_for_twitter(input_text):
+class ModelRegistry:
     """
-    Takes existing text, coollect more information and refines it into an optimized tweet using the Gemini API.
+    Process-wide cache of configured Gemini model handles, shared by the GUI,
+    the scheduler and the task runner. genai.configure() runs only when the API
+    key changes, and model objects are built once per (model name, profile).
     """
-    load_dotenv()
-    gemini_key = os.getenv("GEMINI_API_KEY")
 
-    if not gemini_key:
-        print("🔴 Error: GEMINI_API_KEY not found in .env file.")
-        raise ValueError("GEMINI_API_KEY not found in .env file.")
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._config = None
+        self._models = {}
 
-    try:
-        genai.configure(api_key=gemini_key)
-        model = genai.GenerativeModel('gemini-2.0-flash')
+    def get(self, model_name=DEFAULT_MODEL, profile="default"):
+        api_key = get_env("GEMINI_API_KEY")
+        if not api_key:
+            raise MissingAPIKeyError("GEMINI_API_KEY not found in .env file.")
+        # GEMINI_API_ENDPOINT points the client at another server (e.g. the
+        # load-test fakes in fake_services.py); REST is needed for plain http.
+        endpoint = get_env("GEMINI_API_ENDPOINT")
+        with self._lock:
+            if (api_key, endpoint) != self._config:
+                # New or rotated key: handles built with the old one must go.
+                if endpoint:
+                    genai.configure(api_key=api_key, transport="rest",
+                                    client_options={"api_endpoint": endpoint})
+                else:
+                    genai.configure(api_key=api_key)
+                self._config = (api_key, endpoint)
+                self._models.clear()
+            key = (model_name, profile)
+            if key not in self._models:
+                self._models[key] = genai.GenerativeModel(
+                    model_name, generation_config=GENERATION_PROFILES[profile]
+                )
+            return self._models[key]
 
-        # This is a highly specific prompt for the refinement task
-        refinement_prompt = f"""
+    @property
+    def rest(self):
+        """True while the models talk REST to GEMINI_API_ENDPOINT (see _agenerate)."""
+        with self._lock:
+            return bool(self._config and self._config[1])
+
+    def invalidate(self):
+        with self._lock:
+            self._config = None
+            self._models.clear()
+
+
+# Prompt templates, filled with str.format(input_text=...).
+TWITTER_REFINE_TEMPLATE = """
         Act as an expert social media manager. Your task is to take the following text and refine it into a single, highly engaging tweet for the X platform.
 
         Your response MUST follow these rules:
@@ -73,34 +98,7 @@ def refine_text_for_twitter(input_text):
         ---
         """
 
-        print("🔵 Sending text to Gemini AI for refinement...")
-        response = model.generate_content(refinement_prompt)
-        
-        print("✅ Received refined response from Gemini.")
-        # Clean up the response, removing potential markdown or quotes
-        refined_text = response.text.strip().replace('"', '').replace('*', '')
-        return refined_text
-    except Exception as e:
-        print(f"🔴 An error occurred during refinement with the Gemini API: {e}")
-        raise e
-    
-def refine_text_for_reddit(input_text):
-    """
-    Takes existing text, coollect more information and refines it into an optimized reddit post using the Gemini API.
-    """
-    load_dotenv()
-    gemini_key = os.getenv("GEMINI_API_KEY")
-
-    if not gemini_key:
-        print("🔴 Error: GEMINI_API_KEY not found in .env file.")
-        raise ValueError("GEMINI_API_KEY not found in .env file.")
-
-    try:
-        genai.configure(api_key=gemini_key)
-        model = genai.GenerativeModel('gemini-2.0-flash')
-
-        # This is a highly specific prompt for the refinement task
-        refinement_prompt = f"""
+REDDIT_REFINE_TEMPLATE = """
         Act as an expert social media manager. Your task is to take the following text and refine it into a single, highly engaging tweet for the X platform.
 
         Your response MUST follow these rules:
@@ -116,14 +114,478 @@ def refine_text_for_reddit(input_text):
         ---
         """
 
+
+def template_id(name, template):
+    """Id of a prompt template in metrics and cache keys; it changes whenever the template text does."""
+    return f"{name}-{hashlib.sha256(template.encode('utf-8')).hexdigest()[:8]}"
+
+
+TWITTER_REFINE_ID = template_id("refine_twitter", TWITTER_REFINE_TEMPLATE)
+REDDIT_REFINE_ID = template_id("refine_reddit", REDDIT_REFINE_TEMPLATE)
+
+_registry = ModelRegistry()
+_response_cache = ResponseCache()
+
+
+def get_model(model_name=DEFAULT_MODEL, profile="default"):
+    return _registry.get(model_name, profile)
+
+
+def get_response_cache():
+    return _response_cache
+
+
+def set_response_cache(cache):
+    """
+    Swaps the response cache, e.g. for ResponseCache(disk_path=...) to keep
+    responses across restarts. Anything with get(key) / put(key, value, latency)
+    works; None disables caching.
+    """
+    global _response_cache
+    _response_cache = cache
+
+
+def _request_options():
+    # retry=None turns off the SDK's own retries; resilience.call does the retrying,
+    # so each attempt is visible to the circuit breaker and the metrics.
+    return {"timeout": resilience.request_timeout(GEMINI_TIMEOUT), "retry": None}
+
+
+def _record_call(model_name, template_id, cache_status, start, response=None, error=None, **extra):
+    """Adds one call to gemini_metrics; `response` is where the usage metadata comes from."""
+    prompt_tokens, output_tokens, total_tokens = usage_counts(response)
+    get_metrics().record(CallRecord(
+        model_name, template_id, cache_status, time.perf_counter() - start,
+        prompt_tokens, output_tokens, total_tokens,
+        error=type(error).__name__ if error is not None else None, **extra,
+    ))
+
+
+def _generate(prompt, template_id, model_name, profile, use_cache):
+    """
+    Sends `prompt` and returns the raw response text. Identical requests are
+    answered from the response cache unless `use_cache` is False.
+    """
+    start = time.perf_counter()
+    cache = _response_cache if use_cache else None
+    cache_status = CACHE_OFF if cache is None else CACHE_MISS
+    key = None
+    if cache is not None:
+        key = make_cache_key(model_name, template_id, prompt, GENERATION_PROFILES[profile])
+        cached = cache.get(key)
+        if cached is not None:
+            print("✅ Using cached Gemini response.")
+            _record_call(model_name, template_id, CACHE_HIT, start)
+            return cached
+
+    try:
+        model = get_model(model_name, profile)
+        response = resilience.call(
+            "gemini",
+            lambda: model.generate_content(prompt, request_options=_request_options()),
+        )
+        text = response.text
+    except Exception as e:
+        _record_call(model_name, template_id, cache_status, start, error=e)
+        raise
+    _record_call(model_name, template_id, cache_status, start, response)
+    if cache is not None:
+        cache.put(key, text, time.perf_counter() - start)
+    return text
+
+
+def stream_generate(prompt, template_id="post", model_name=DEFAULT_MODEL, profile="default", use_cache=True):
+    """
+    Yields the response text in chunks as Gemini produces them, so callers can
+    show output before the whole response is done. A cached response is
+    yielded as a single chunk; a completed stream is added to the cache.
+    Chunks are raw model output; see clean_refined_text().
+    """
+    start = time.perf_counter()
+    cache = _response_cache if use_cache else None
+    cache_status = CACHE_OFF if cache is None else CACHE_MISS
+    key = None
+    if cache is not None:
+        key = make_cache_key(model_name, template_id, prompt, GENERATION_PROFILES[profile])
+        cached = cache.get(key)
+        if cached is not None:
+            _record_call(model_name, template_id, CACHE_HIT, start, streamed=True)
+            yield cached
+            return
+
+    parts = []
+    usage_chunk = None  # usage metadata arrives with the last chunk
+    first_chunk_time = None
+    error = None
+    try:
+        model = get_model(model_name, profile)
+        # Only opening the stream is retried; a stream that breaks midway is not restarted.
+        stream = resilience.call(
+            "gemini",
+            lambda: model.generate_content(
+                prompt, stream=True, request_options=_request_options()
+            ),
+        )
+        for chunk in stream:
+            if usage_counts(chunk)[2]:
+                usage_chunk = chunk
+            try:
+                text = chunk.text
+            except ValueError:  # chunk without text parts, e.g. only safety metadata
+                continue
+            if text:
+                if first_chunk_time is None:
+                    first_chunk_time = time.perf_counter() - start
+                parts.append(text)
+                yield text
+    except BaseException as e:  # GeneratorExit too: the consumer stopped reading
+        error = e
+        raise
+    finally:
+        _record_call(model_name, template_id, cache_status, start, usage_chunk, error,
+                     streamed=True, first_chunk_time=first_chunk_time)
+    if cache is not None:
+        cache.put(key, "".join(parts), time.perf_counter() - start)
+
+
+def generate_post_from_prompt(prompt, model_name=DEFAULT_MODEL, profile="default", use_cache=True):
+    """
+    Generates tweet text from a given prompt using the Gemini API.
+    Pass use_cache=False when a fresh response is required.
+    """
+    try:
+        print("🔵 Sending prompt to Gemini AI...")
+        text = _generate(prompt, "post", model_name, profile, use_cache)
+
+        print("✅ Received response from Gemini.")
+        # Return the generated text, removing any potential markdown like asterisks
+        return text.strip().replace('*', '')
+
+    except MissingAPIKeyError:
+        print("🔴 Error: GEMINI_API_KEY not found in .env file.")
+        return None
+    except Exception as e:
+        print(f"🔴 An error occurred with the Gemini API: {e}")
+        return None
+
+
+def clean_refined_text(text):
+    """Clean up a refinement response, removing potential markdown or quotes."""
+    return text.strip().replace('"', '').replace('*', '')
+
+
+def _refine(template, template_id, input_text, model_name, profile, use_cache):
+    try:
         print("🔵 Sending text to Gemini AI for refinement...")
-        response = model.generate_content(refinement_prompt)
-        
+        text = _generate(template.format(input_text=input_text), template_id, model_name, profile, use_cache)
+
         print("✅ Received refined response from Gemini.")
-        # Clean up the response, removing potential markdown or quotes
-        refined_text = response.text.strip().replace('"', '').replace('*', '')
-        return refined_text
+        return clean_refined_text(text)
+    except MissingAPIKeyError:
+        print("🔴 Error: GEMINI_API_KEY not found in .env file.")
+        raise
+    except Exception as e:
+        print(f"🔴 An error occurred during refinement with the Gemini API: {e}")
+        raise e
 
+
+def refine_text_for_twitter(input_text, model_name=DEFAULT_MODEL, profile="default", use_cache=True):
+    """
+    Takes existing text, coollect more information and refines it into an optimized tweet using the Gemini API.
+    """
+    return _refine(TWITTER_REFINE_TEMPLATE, TWITTER_REFINE_ID, input_text, model_name, profile, use_cache)
+
+
+def refine_text_for_reddit(input_text, model_name=DEFAULT_MODEL, profile="default", use_cache=True):
+    """
+    Takes existing text, coollect more information and refines it into an optimized reddit post using the Gemini API.
+    """
+    return _refine(REDDIT_REFINE_TEMPLATE, REDDIT_REFINE_ID, input_text, model_name, profile, use_cache)
+
+
+_PLATFORM_TEMPLATES = {
+    "twitter": (TWITTER_REFINE_TEMPLATE, TWITTER_REFINE_ID),
+    "reddit": (REDDIT_REFINE_TEMPLATE, REDDIT_REFINE_ID),
+}
+
+
+def stream_refine_text(input_text, platform, model_name=DEFAULT_MODEL, profile="default", use_cache=True):
+    """
+    Streaming counterpart of refine_text_for_twitter / refine_text_for_reddit:
+    yields raw text chunks; pass the joined result through clean_refined_text().
+    """
+    template, template_id = _PLATFORM_TEMPLATES[platform]
+    yield from stream_generate(template.format(input_text=input_text), template_id, model_name, profile, use_cache)
+
+
+PLATFORM_CHARACTER_LIMITS = {"twitter": 280, "reddit": 300}
+
+
+def fit_draft(text, platform):
+    """Fits `text` to the platform's limit without a model call; returns a text_fit.FitResult."""
+    return fit_for_platform(text, platform, PLATFORM_CHARACTER_LIMITS[platform])
+
+
+_PLATFORM_REFINERS = {
+    "twitter": refine_text_for_twitter,
+    "reddit": refine_text_for_reddit,
+}
+
+
+@dataclass
+class RefinedDrafts:
+    """Refined text per platform, plus the platforms whose refinement failed."""
+    texts: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+
+    def __getitem__(self, platform):
+        return self.texts[platform]
+
+    def get(self, platform, default=None):
+        return self.texts.get(platform, default)
+
+    def is_valid(self, platform):
+        text = self.texts.get(platform, "")
+        limit = PLATFORM_CHARACTER_LIMITS.get(platform)
+        return bool(text.strip()) and (limit is None or platform_length(text, platform) <= limit)
+
+    def fit_to_limits(self):
+        """
+        Trims over-long drafts locally (see text_fit). Returns the platforms
+        that could only be fitted by truncating mid-sentence.
+        """
+        truncated = []
+        for platform, text in self.texts.items():
+            result = fit_draft(text, platform)
+            self.texts[platform] = result.text
+            if result.truncated:
+                truncated.append(platform)
+        return truncated
+
+    @property
+    def ok(self):
+        return not self.errors and all(self.is_valid(p) for p in self.texts)
+
+
+def refine_text_for_platforms(input_text, platforms=("twitter", "reddit"), fit=True, **kwargs):
+    """
+    Refines the same text for several platforms at once. The per-platform
+    requests run concurrently, so the wait is one model round-trip instead of
+    one per platform. A failing platform is reported in `errors` without
+    discarding the others. Extra keyword arguments go to every refiner.
+
+    With `fit`, over-long drafts are trimmed locally; only a draft that would
+    have to be cut mid-sentence is sent back for one fresh refinement.
+    """
+    drafts = RefinedDrafts()
+    with ThreadPoolExecutor(max_workers=len(platforms) or 1) as executor:
+        futures = {
+            platform: executor.submit(_PLATFORM_REFINERS[platform], input_text, **kwargs)
+            for platform in platforms
+        }
+        for platform, future in futures.items():
+            try:
+                drafts.texts[platform] = future.result()
+            except Exception as e:
+                drafts.errors[platform] = str(e)
+    if fit:
+        for platform in drafts.fit_to_limits():
+            try:
+                retry = fit_draft(_PLATFORM_REFINERS[platform](input_text, **{**kwargs, "use_cache": False}), platform)
+            except Exception:
+                continue  # keep the truncated draft
+            if not retry.truncated:
+                drafts.texts[platform] = retry.text
+    return drafts
+
+
+# --- asyncio API ---------------------------------------------------------------
+
+# Defaults match the gemini-2.0-flash free tier; raise them with
+# configure_async_limits() on a paid quota.
+ASYNC_REQUESTS_PER_MINUTE = 15
+ASYNC_TOKENS_PER_MINUTE = 1_000_000
+ASYNC_MAX_CONCURRENCY = 8
+ESTIMATED_OUTPUT_TOKENS = 256
+
+
+def estimate_tokens(prompt):
+    """Rough pre-call token estimate (about 4 characters per token) plus a typical response."""
+    return len(prompt) // 4 + ESTIMATED_OUTPUT_TOKENS
+
+
+class AsyncGeminiLimiter:
+    """
+    Admission control for the async calls: at most `max_concurrency` requests
+    in flight, and requests and tokens per minute held under the quota with two
+    token buckets. Waiters pass the buckets one at a time in arrival order
+    (asyncio.Lock is FIFO), so a burst of large prompts cannot starve the rest.
+    The buckets are shared by every event loop in the process; the asyncio
+    primitives are created per loop.
+    """
+
+    def __init__(self, requests_per_minute=ASYNC_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=ASYNC_TOKENS_PER_MINUTE, max_concurrency=ASYNC_MAX_CONCURRENCY):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self._per_loop = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _primitives(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._per_loop:
+                self._per_loop[loop] = (asyncio.Semaphore(self.max_concurrency), asyncio.Lock())
+            return self._per_loop[loop]
+
+    @contextlib.asynccontextmanager
+    async def slot(self, estimated_tokens):
+        semaphore, fair_queue = self._primitives()
+        async with semaphore:
+            async with fair_queue:
+                await self.requests.acquire_async(1)
+                await self.tokens.acquire_async(estimated_tokens)
+            yield
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Corrects the token bucket once the real usage is known."""
+        if actual_tokens:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+
+_async_limiter = AsyncGeminiLimiter()
+
+
+def set_async_limiter(limiter):
+    """Replaces the limiter of the async calls; returns the previous one."""
+    global _async_limiter
+    previous, _async_limiter = _async_limiter, limiter
+    return previous
+
+
+def configure_async_limits(requests_per_minute=ASYNC_REQUESTS_PER_MINUTE,
+                           tokens_per_minute=ASYNC_TOKENS_PER_MINUTE, max_concurrency=ASYNC_MAX_CONCURRENCY):
+    return set_async_limiter(AsyncGeminiLimiter(requests_per_minute, tokens_per_minute, max_concurrency))
+
+
+async def _agenerate(prompt, template_id, model_name, profile, use_cache):
+    start = time.perf_counter()
+    cache = _response_cache if use_cache else None
+    cache_status = CACHE_OFF if cache is None else CACHE_MISS
+    key = None
+    if cache is not None:
+        key = make_cache_key(model_name, template_id, prompt, GENERATION_PROFILES[profile])
+        cached = cache.get(key)
+        if cached is not None:
+            print("✅ Using cached Gemini response.")
+            _record_call(model_name, template_id, CACHE_HIT, start)
+            return cached
+
+    limiter = _async_limiter
+    estimated = estimate_tokens(prompt)
+    latency = 0.0
+
+    async def attempt():
+        nonlocal latency
+        # Every attempt, retries included, takes its own slot and quota.
+        async with limiter.slot(estimated):
+            attempt_start = time.perf_counter()
+            try:
+                if _registry.rest:
+                    # The SDK's async client can't await its REST transport; run the sync call on a thread.
+                    return await asyncio.to_thread(model.generate_content, prompt,
+                                                   request_options=_request_options())
+                return await model.generate_content_async(
+                    prompt, request_options=_request_options()
+                )
+            finally:
+                latency = time.perf_counter() - attempt_start
+
+    try:
+        model = get_model(model_name, profile)
+        response = await resilience.acall("gemini", attempt)
+        text = response.text
+    except Exception as e:
+        _record_call(model_name, template_id, cache_status, start, error=e)
+        raise
+    _record_call(model_name, template_id, cache_status, start, response)
+    limiter.settle(estimated, usage_counts(response)[2])
+    if cache is not None:
+        cache.put(key, text, latency)
+    return text
+
+
+async def agenerate_post_from_prompt(prompt, model_name=DEFAULT_MODEL, profile="default", use_cache=True):
+    """Async counterpart of generate_post_from_prompt()."""
+    try:
+        print("🔵 Sending prompt to Gemini AI...")
+        text = await _agenerate(prompt, "post", model_name, profile, use_cache)
+        print("✅ Received response from Gemini.")
+        return text.strip().replace('*', '')
+    except MissingAPIKeyError:
+        print("🔴 Error: GEMINI_API_KEY not found in .env file.")
+        return None
+    except Exception as e:
+        print(f"🔴 An error occurred with the Gemini API: {e}")
+        return None
+
+
+async def _arefine(platform, input_text, model_name, profile, use_cache):
+    template, template_id = _PLATFORM_TEMPLATES[platform]
+    try:
+        print("🔵 Sending text to Gemini AI for refinement...")
+        text = await _agenerate(template.format(input_text=input_text), template_id, model_name, profile, use_cache)
+        print("✅ Received refined response from Gemini.")
+        return clean_refined_text(text)
+    except MissingAPIKeyError:
+        print("🔴 Error: GEMINI_API_KEY not found in .env file.")
+        raise
     except Exception as e:
         print(f"🔴 An error occurred during refinement with the Gemini API: {e}")
-        raise e
\ No newline at end of file
+        raise e
+
+
+async def arefine_text_for_twitter(input_text, model_name=DEFAULT_MODEL, profile="default", use_cache=True):
+    """Async counterpart of refine_text_for_twitter()."""
+    return await _arefine("twitter", input_text, model_name, profile, use_cache)
+
+
+async def arefine_text_for_reddit(input_text, model_name=DEFAULT_MODEL, profile="default", use_cache=True):
+    """Async counterpart of refine_text_for_reddit()."""
+    return await _arefine("reddit", input_text, model_name, profile, use_cache)
+
+
+async def arefine_text_for_platforms(input_text, platforms=("twitter", "reddit"), model_name=DEFAULT_MODEL,
+                                     profile="default", use_cache=True, fit=True):
+    """Async counterpart of refine_text_for_platforms()."""
+    results = await asyncio.gather(
+        *(_arefine(platform, input_text, model_name, profile, use_cache) for platform in platforms),
+        return_exceptions=True,
+    )
+    drafts = RefinedDrafts()
+    for platform, result in zip(platforms, results):
+        if isinstance(result, Exception):
+            drafts.errors[platform] = str(result)
+        else:
+            drafts.texts[platform] = result
+    if fit:
+        for platform in drafts.fit_to_limits():
+            try:
+                retry = fit_draft(await _arefine(platform, input_text, model_name, profile, False), platform)
+            except Exception:
+                continue  # keep the truncated draft
+            if not retry.truncated:
+                drafts.texts[platform] = retry.text
+    return drafts
+
+
+async def arefine_many(texts, platform="twitter", model_name=DEFAULT_MODEL, profile="default", use_cache=True):
+    """
+    Refines a batch of texts for one platform as fast as the quota allows.
+    Returns one result per input, in order; failed items are the exception.
+    """
+    return await asyncio.gather(
+        *(_arefine(platform, text, model_name, profile, use_cache) for text in texts),
+        return_exceptions=True,
+    )
@@ -0,0 +1,178 @@
+# gemini_metrics.py
+"""
+Per-call accounting for Gemini requests: token counts (from the response's
+usage metadata), wall time, model, prompt template and cache status.
+
+GeminiMetrics keeps the most recent calls for rolling summaries (percentiles,
+hit rates, tokens per template) plus cumulative counters, and exports both as
+JSON lines and in the Prometheus text format.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+
+DEFAULT_WINDOW = 1000  # calls kept for the rolling summary
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Estimated USD per million tokens (input, output); unknown models cost 0.
+MODEL_PRICES = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+}
+
+CACHE_HIT, CACHE_MISS, CACHE_OFF = "hit", "miss", "off"
+
+
+@dataclass
+class CallRecord:
+    model: str
+    template_id: str
+    cache: str  # CACHE_HIT, CACHE_MISS or CACHE_OFF
+    wall_time: float  # seconds, retries and rate-limit waits included
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+    streamed: bool = False
+    first_chunk_time: float = None  # seconds until the first streamed chunk
+    error: str = None
+    timestamp: float = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def cost(self):
+        input_price, output_price = MODEL_PRICES.get(self.model, (0.0, 0.0))
+        return (self.prompt_tokens * input_price + self.output_tokens * output_price) / 1_000_000
+
+
+def usage_counts(response):
+    """(prompt, output, total) tokens from a Gemini response or stream chunk; zeros if missing."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return 0, 0, 0
+    prompt = getattr(usage, "prompt_token_count", 0) or 0
+    output = getattr(usage, "candidates_token_count", 0) or 0
+    total = getattr(usage, "total_token_count", 0) or prompt + output
+    return prompt, output, total
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(pct / 100 * len(sorted_values)))]
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{str(value)}"' for name, value in labels.items())
+
+
+class GeminiMetrics:
+    def __init__(self, window=DEFAULT_WINDOW):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self._totals = {}  # (model, template, cache, status) -> cumulative counters
+
+    def record(self, record):
+        if not record.timestamp:
+            record.timestamp = time.time()
+        key = (record.model, record.template_id, record.cache, "ok" if record.ok else "error")
+        with self._lock:
+            self._recent.append(record)
+            totals = self._totals.setdefault(key, {
+                "calls": 0, "prompt_tokens": 0, "output_tokens": 0, "cost": 0.0,
+                "wall_time": 0.0, "buckets": [0] * len(LATENCY_BUCKETS),
+            })
+            totals["calls"] += 1
+            totals["prompt_tokens"] += record.prompt_tokens
+            totals["output_tokens"] += record.output_tokens
+            totals["cost"] += record.cost
+            totals["wall_time"] += record.wall_time
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if record.wall_time <= bound:
+                    totals["buckets"][i] += 1
+
+    def recent(self):
+        with self._lock:
+            return list(self._recent)
+
+    def summary(self):
+        """Rolling stats over the recent calls, per (model, template id)."""
+        groups = {}
+        for record in self.recent():
+            groups.setdefault(f"{record.model}/{record.template_id}", []).append(record)
+        summary = {}
+        for name, records in groups.items():
+            called = [r for r in records if r.cache != CACHE_HIT and r.ok]
+            latencies = sorted(r.wall_time for r in called)
+            summary[name] = {
+                "calls": len(records),
+                "errors": sum(not r.ok for r in records),
+                "cache_hit_rate": sum(r.cache == CACHE_HIT for r in records) / len(records),
+                "p50_s": _percentile(latencies, 50),
+                "p95_s": _percentile(latencies, 95),
+                "avg_prompt_tokens": sum(r.prompt_tokens for r in called) / len(called) if called else 0,
+                "avg_output_tokens": sum(r.output_tokens for r in called) / len(called) if called else 0,
+                "cost_usd": round(sum(r.cost for r in records), 6),
+            }
+        return summary
+
+    def to_json_lines(self):
+        return "".join(json.dumps({**asdict(r), "cost": r.cost}) + "\n" for r in self.recent())
+
+    def export_json_lines(self, path):
+        """Appends the recent calls to `path`, one JSON object per line."""
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(self.to_json_lines())
+
+    def to_prometheus(self):
+        with self._lock:
+            totals = {key: {**value, "buckets": list(value["buckets"])} for key, value in self._totals.items()}
+        lines = [
+            "# HELP gemini_calls_total Gemini generate calls.",
+            "# TYPE gemini_calls_total counter",
+        ]
+        for (model, template, cache, status), value in totals.items():
+            lines.append(f"gemini_calls_total{{{_labels(model=model, template=template, cache=cache, status=status)}}} "
+                         f"{value['calls']}")
+        for metric, field, help_text in (
+            ("gemini_prompt_tokens_total", "prompt_tokens", "Prompt tokens sent to Gemini."),
+            ("gemini_output_tokens_total", "output_tokens", "Output tokens received from Gemini."),
+            ("gemini_cost_usd_total", "cost", "Estimated Gemini cost in USD."),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            merged = {}
+            for (model, template, _, _), value in totals.items():
+                merged[(model, template)] = merged.get((model, template), 0) + value[field]
+            for (model, template), amount in merged.items():
+                lines.append(f"{metric}{{{_labels(model=model, template=template)}}} {amount}")
+        lines += [
+            "# HELP gemini_call_duration_seconds Wall time of Gemini calls.",
+            "# TYPE gemini_call_duration_seconds histogram",
+        ]
+        for (model, template, cache, status), value in totals.items():
+            labels = _labels(model=model, template=template, cache=cache, status=status)
+            for bound, count in zip(LATENCY_BUCKETS, value["buckets"]):
+                lines.append(f'gemini_call_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'gemini_call_duration_seconds_bucket{{{labels},le="+Inf"}} {value["calls"]}')
+            lines.append(f"gemini_call_duration_seconds_sum{{{labels}}} {value['wall_time']}")
+            lines.append(f"gemini_call_duration_seconds_count{{{labels}}} {value['calls']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._recent.clear()
+            self._totals.clear()
+
+
+_metrics = GeminiMetrics()
+
+
+def get_metrics():
+    return _metrics
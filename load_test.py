@@ -0,0 +1,264 @@
+# load_test.py
+"""
+End-to-end load test of the posting pipeline against the local fakes in
+fake_services.py. Drives N pipeline runs with a fixed concurrency and reports
+throughput and p50/p95/p99 latency per stage.
+
+    python load_test.py --runs 100 --concurrency 10 --latency 0.3 --error-rate 0.05
+
+--pipeline stages   generate -> refine -> publish, timed per stage and per platform
+--pipeline async    the same with the async Gemini calls (agenerate / arefine), one event loop per run
+--pipeline task     task_to_run.run_bot_task as a black box
+
+Runs where the journal found nothing new to post are counted as skipped,
+not as successes.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_services import (FakeServiceConfig, client_environment, start_fake_services,
+                           stop_fake_services)
+from publish_journal import PublishJournal, new_nonce, set_default_journal
+from gemini_client import ASYNC_MAX_CONCURRENCY, configure_async_limits, set_async_limiter
+from publisher import split_results
+
+FAKE_QUOTA_PER_MINUTE = 1_000_000
+
+LOAD_TEST_PROMPT = """
+        The tweet should be about the importance of embracing change and constantly learning new skills.
+        The tone should be positive and motivational.
+        Include these relevant hashtags such as: #SoftwareDeveloper #AI #Upskilling
+        """
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class StageRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = {}  # stage -> [seconds]
+        self.failures = {}  # stage -> count
+        self.skips = {}  # stage -> count of runs that posted nothing new
+
+    def record(self, stage, seconds, ok=True, skipped=False):
+        with self._lock:
+            self.durations.setdefault(stage, []).append(seconds)
+            if not ok:
+                self.failures[stage] = self.failures.get(stage, 0) + 1
+            elif skipped:
+                self.skips[stage] = self.skips.get(stage, 0) + 1
+
+    def record_publish(self, stage, seconds, results):
+        """Records a publish by its results; returns True if every leg went out now."""
+        posted, earlier, failed = split_results(results or {})
+        self.record(stage, seconds, ok=results is not None and not failed, skipped=not posted)
+        return bool(posted) and not earlier and not failed
+
+    def timed(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record(stage, time.perf_counter() - start, ok=False)
+            raise
+        self.record(stage, time.perf_counter() - start)
+        return result
+
+    def report(self, wall_time):
+        report = {}
+        with self._lock:
+            for stage, values in self.durations.items():
+                values = sorted(values)
+                report[stage] = {
+                    "count": len(values),
+                    "failures": self.failures.get(stage, 0),
+                    "skipped": self.skips.get(stage, 0),
+                    "throughput_per_s": len(values) / wall_time if wall_time else 0.0,
+                    "p50_ms": percentile(values, 50) * 1000,
+                    "p95_ms": percentile(values, 95) * 1000,
+                    "p99_ms": percentile(values, 99) * 1000,
+                }
+        return report
+
+
+def _publish_stage(recorder, drafts, text):
+    """Publishes through the publisher, journal included, like the bot itself; True if every leg went out."""
+    from publisher import drafts_for, publish
+
+    stage_start = time.perf_counter()
+    _, results = publish(drafts_for(drafts, text), nonce=new_nonce())
+    for leg, result in results.items():
+        recorder.record(f"post_{leg.split('/', 1)[0]}", result.latency, ok=result.ok, skipped=result.skipped)
+    return recorder.record_publish("publish", time.perf_counter() - stage_start, results)
+
+
+def _stages_pipeline(recorder):
+    from gemini_client import generate_post_from_prompt, refine_text_for_platforms
+
+    def run():
+        start = time.perf_counter()
+        ok = False
+        try:
+            stage_start = time.perf_counter()
+            text = generate_post_from_prompt(LOAD_TEST_PROMPT, use_cache=False)  # None on failure
+            recorder.record("generate", time.perf_counter() - stage_start, ok=text is not None)
+            if text is None:
+                raise RuntimeError("generation failed")
+            drafts = recorder.timed("refine", refine_text_for_platforms, text)
+            ok = _publish_stage(recorder, drafts, text)
+        except Exception:
+            pass  # counted as a failure of the stage that raised and of the run
+        finally:
+            recorder.record("total", time.perf_counter() - start, ok=ok)
+
+    return run
+
+
+def _async_pipeline(recorder):
+    from gemini_client import agenerate_post_from_prompt, arefine_text_for_platforms
+
+    async def draft():
+        stage_start = time.perf_counter()
+        text = await agenerate_post_from_prompt(LOAD_TEST_PROMPT, use_cache=False)  # None on failure
+        recorder.record("generate", time.perf_counter() - stage_start, ok=text is not None)
+        if text is None:
+            raise RuntimeError("generation failed")
+        stage_start = time.perf_counter()
+        try:
+            drafts = await arefine_text_for_platforms(text)
+        except Exception:
+            recorder.record("refine", time.perf_counter() - stage_start, ok=False)
+            raise
+        recorder.record("refine", time.perf_counter() - stage_start)
+        return text, drafts
+
+    def run():
+        start = time.perf_counter()
+        ok = False
+        try:
+            text, drafts = asyncio.run(draft())
+            ok = _publish_stage(recorder, drafts, text)
+        except Exception:
+            pass  # counted as a failure of the stage that raised and of the run
+        finally:
+            recorder.record("total", time.perf_counter() - start, ok=ok)
+
+    return run
+
+
+def _task_pipeline(recorder):
+    import task_to_run
+
+    def run():
+        start = time.perf_counter()
+        try:
+            results = task_to_run.run_bot_task()
+        except Exception:
+            results = None
+        recorder.record_publish("total", time.perf_counter() - start, results)
+
+    return run
+
+
+PIPELINES = {"stages": _stages_pipeline, "async": _async_pipeline, "task": _task_pipeline}
+
+
+@contextlib.contextmanager
+def patched_environ(values):
+    """Sets environment variables for the duration of the block, then restores the previous values."""
+    previous = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def run_load_test(runs=50, concurrency=8, pipeline="stages", configs=None, quiet=True):
+    """
+    Starts the fakes, points the clients at them and drives `runs` pipeline runs
+    over `concurrency` threads. Returns (per-stage report, fake service stats).
+    `quiet` swallows the clients' own print output while the runs are going.
+    """
+    services = start_fake_services(configs)
+    # Fake posts go to a throwaway journal, not the one that guards the real accounts.
+    journal_dir = tempfile.TemporaryDirectory()
+    previous_journal = set_default_journal(PublishJournal(os.path.join(journal_dir.name, "journal.jsonl")))
+    # The fakes enforce their own rate limits; the async client's free-tier quota would only hide them.
+    previous_limiter = configure_async_limits(requests_per_minute=FAKE_QUOTA_PER_MINUTE,
+                                              tokens_per_minute=FAKE_QUOTA_PER_MINUTE * 1000,
+                                              max_concurrency=max(ASYNC_MAX_CONCURRENCY, 2 * concurrency))
+    # The clients read their credentials on every use, so the fakes' take over for the whole run.
+    environment = patched_environ(client_environment(services))
+    try:
+        recorder = StageRecorder()
+        run = PIPELINES[pipeline](recorder)
+        start = time.perf_counter()
+        output = contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+        with environment, output, ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(runs):
+                pool.submit(run)
+        wall_time = time.perf_counter() - start
+        return recorder.report(wall_time), {name: service.stats() for name, service in services.items()}
+    finally:
+        set_async_limiter(previous_limiter)
+        set_default_journal(previous_journal).close()
+        journal_dir.cleanup()
+        stop_fake_services(services)
+
+
+def print_report(report, service_stats):
+    print(f"{'stage':<14}{'runs':>6}{'failed':>8}{'skipped':>9}{'per s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage in ("generate", "refine", "post_twitter", "post_reddit", "publish", "total"):
+        if stage not in report:
+            continue
+        row = report[stage]
+        print(f"{stage:<14}{row['count']:>6}{row['failures']:>8}{row['skipped']:>9}{row['throughput_per_s']:>9.2f}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+    for name, stats in service_stats.items():
+        print(f"📡 fake {name}: {stats['requests']} requests, {stats['errors']} errors, "
+              f"{stats['throttled']} throttled, {stats['connections']} connections")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the bot against local fake APIs.")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES), default="stages")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean fake latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per window per service, 0 = none")
+    parser.add_argument("--window", type=float, default=60.0)
+    parser.add_argument("--verbose", action="store_true", help="show the clients' own output")
+    args = parser.parse_args()
+
+    config = FakeServiceConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                               rate_limit=args.rate_limit, window=args.window)
+    print(f"🚀 {args.runs} runs, concurrency {args.concurrency}, pipeline '{args.pipeline}'")
+    report, service_stats = run_load_test(args.runs, args.concurrency, args.pipeline,
+                                          {kind: config for kind in ("gemini", "x", "reddit")},
+                                          quiet=not args.verbose)
+    print_report(report, service_stats)
+
+
+if __name__ == "__main__":
+    main()
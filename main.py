@@ -1,9 +1,9 @@
 # main.py
 
 # Import functions from our client files
-from twitter_client import post_tweet
 from gemini_client import generate_post_from_prompt
-from reddit_client import post_reddit
+from publish_journal import new_nonce
+from publisher import drafts_for, publish, split_results
 
 
 # --- THIS IS THE ONLY PLACE YOU NEED TO EDIT ---
@@ -27,7 +27,7 @@ print("🔵 Prompt for AI:", my_prompt)
 
 if __name__ == "__main__":
     # 1. Generate the tweet content using Gemini AI
-    generated_text = generate_post_from_prompt(my_prompt)
+    generated_text = generate_post_from_prompt(my_prompt, use_cache=False)
 
     # 2. Check if the text was generated successfully
     if generated_text:
@@ -35,9 +35,14 @@ if __name__ == "__main__":
         print("🤖 AI Generated Tweet:")
         print(generated_text)
         print("---")
-        # 3. Post the generated tweet to X
-        post_tweet(generated_text)
-        post_reddit(generated_text)
-        print("✅ Tweet and Reddit posted successfully!")
+        # 3. Post the generated text to every registered platform at the same time
+        _, results = publish(drafts_for({}, generated_text), nonce=new_nonce())
+        for result in results.values():
+            print(result.summary())
+        posted, earlier, failed = split_results(results)
+        if earlier and not posted and not failed:
+            print("🟡 This exact post already went out earlier; nothing new was posted.")
+        elif not failed:
+            print("✅ Posted to every platform successfully!")
     else:
         print("🔴 Failed to generate tweet content. Aborting post.")
\ No newline at end of file
@@ -0,0 +1,295 @@
+# publish_journal.py
+"""
+Write-ahead journal of publishing, so a crash or a retry never posts the same
+thing twice.
+
+Every post gets an idempotency key, and its drafts are journaled before
+anything goes out. Each platform leg is then recorded twice: once before the
+request is sent and once with the result (the tweet id or the Reddit
+shortlink). Publishing the same key again, or recovering after a crash,
+only runs the legs that are still missing.
+
+A leg that was started but has no recorded result (the process died
+mid-request) is "in doubt". The post may or may not be live, so it is
+reported and only retried when asked to. A leg waiting for a worker is
+"queued"; that state lives in memory only, so no other publish picks the leg
+up meanwhile, and it is forgotten on restart along with the queue.
+
+Records are appended as JSON lines. Concurrent writers share one fsync per
+batch. Compaction rewrites the file as one snapshot line per live post, so
+startup stays fast no matter how many records have been appended.
+
+publisher.py does the posting and keeps this journal up to date.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from env_config import CACHE_DIR
+
+DEFAULT_JOURNAL_PATH = CACHE_DIR / "publish_journal.jsonl"
+DEFAULT_RETENTION = 30 * 24 * 3600  # settled posts are remembered this long, then compacted away
+DEFAULT_COMPACT_EVERY = 10_000  # appended lines before the journal is considered for compaction
+MAX_ATTEMPTS = 3  # a leg that failed this often is left for a human to look at
+
+PENDING, QUEUED, IN_DOUBT, DONE, FAILED = "pending", "queued", "in_doubt", "done", "failed"
+
+
+def make_key(drafts, nonce=None):
+    """
+    Idempotency key for a set of drafts ({platform: text}): the same drafts get
+    the same key. A `nonce` from new_nonce(), one per generated draft, keeps a
+    deliberate repeat of the same text apart from a retry of the same post.
+    """
+    payload = drafts if nonce is None else {"drafts": drafts, "nonce": nonce}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
+def new_nonce():
+    return uuid.uuid4().hex
+
+
+class PublishJournal:
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, retention=DEFAULT_RETENTION, compact_every=DEFAULT_COMPACT_EVERY):
+        self.path = Path(path)
+        self.retention = retention
+        self.compact_every = compact_every
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()  # entries, the file object and the counters
+        self._sync_lock = threading.Lock()  # one fsync at a time; the others wait and piggyback
+        self._entries = {}  # key -> {"created_at", "drafts", "legs": {platform: leg}}
+        self._lines = 0
+        self._written = 0
+        self._synced = 0
+        self._load()
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self._lines > self.compact_every and self._lines > 2 * len(self._entries):
+            self.compact()
+
+    # --- storage -----------------------------------------------------------------
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # The last append was cut short by a crash; drop it so new records start on a clean line.
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        for line in data[:end].splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                print(f"🟡 Skipping a damaged line in {self.path.name}.")
+                continue
+            self._lines += 1
+        for entry in self._entries.values():
+            for leg in entry["legs"].values():
+                _unqueue(leg)  # the process that queued it is gone
+
+    def _apply(self, record):
+        event, key = record["event"], record["key"]
+        if event == "snapshot":
+            self._entries[key] = record["entry"]
+            return
+        if event == "begin":
+            self._entries.setdefault(key, {
+                "created_at": record["ts"],
+                "drafts": record["drafts"],
+                "legs": {platform: {"status": PENDING, "attempts": 0} for platform in record["drafts"]},
+            })
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            return  # compacted away
+        leg = entry["legs"].setdefault(record["platform"], {"status": PENDING, "attempts": 0})
+        if event == "attempt":
+            leg.pop("queued_from", None)
+            leg["status"] = IN_DOUBT
+            leg["attempts"] += 1
+            leg["attempted_at"] = record["ts"]
+        elif event == "result":
+            leg["status"] = FAILED if record.get("error") else DONE
+            leg["ref"] = record.get("ref")
+            leg["error"] = record.get("error")
+            leg["finished_at"] = record["ts"]
+
+    def _append(self, record):
+        """Appends `record` and returns once it is on disk."""
+        record["ts"] = time.time()
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._apply(record)
+            self._file.write(line)
+            self._lines += 1
+            self._written += 1
+            seq = self._written
+        self._sync(seq)
+        if self._lines > self.compact_every and self._lines > 2 * len(self._entries):
+            self.compact()
+
+    def _sync(self, seq):
+        with self._sync_lock:
+            if self._synced >= seq:
+                return  # another writer's fsync already covered this record
+            with self._lock:
+                self._file.flush()
+                target = self._written
+                fd = self._file.fileno()
+            os.fsync(fd)  # records appended meanwhile go out with the next batch
+            self._synced = target
+
+    def compact(self):
+        """
+        Rewrites the journal as one snapshot line per post, dropping settled
+        posts (see _is_settled) untouched for longer than the retention period.
+        Returns the number of lines saved.
+        """
+        cutoff = time.time() - self.retention
+        with self._sync_lock, self._lock:
+            self._entries = {
+                key: entry for key, entry in self._entries.items()
+                if not _is_settled(entry, cutoff) or _last_activity(entry) >= cutoff
+            }
+            before = self._lines
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for key, entry in self._entries.items():
+                    f.write(json.dumps({"event": "snapshot", "key": key, "entry": entry}, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._lines = len(self._entries)
+            self._synced = self._written
+        return before - self._lines
+
+    def close(self):
+        with self._sync_lock, self._lock:
+            self._file.close()
+
+    # --- recording -------------------------------------------------------------------
+
+    def begin(self, drafts, key=None, nonce=None):
+        """Journals the drafts ({platform: text}) of a post; returns its idempotency key."""
+        key = key or make_key(drafts, nonce)
+        with self._lock:
+            known = key in self._entries
+        if not known:
+            self._append({"event": "begin", "key": key, "drafts": drafts})
+        return key
+
+    def record_attempt(self, key, platform):
+        self._append({"event": "attempt", "key": key, "platform": platform})
+
+    def record_result(self, key, platform, ref=None, error=None):
+        self._append({"event": "result", "key": key, "platform": platform, "ref": ref, "error": error})
+
+    def claim_legs(self, key, retry_in_doubt=False):
+        """
+        Marks the missing legs of `key` as queued, so no other publish sends
+        them meanwhile, and returns their platforms. Each one must then be
+        attempted or handed back with release().
+        """
+        with self._lock:
+            platforms = self._missing(key, retry_in_doubt)
+            for platform in platforms:
+                leg = self._entries[key]["legs"][platform]
+                leg["queued_from"], leg["status"] = leg["status"], QUEUED
+            return platforms
+
+    def release(self, key, platform):
+        """Hands back a claimed leg that was never attempted."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and platform in entry["legs"]:
+                _unqueue(entry["legs"][platform])
+
+    # --- queries -------------------------------------------------------------------------
+
+    def entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return json.loads(json.dumps(entry)) if entry is not None else None
+
+    def missing_legs(self, key, retry_in_doubt=False):
+        """Platforms of `key` that still have to be posted."""
+        with self._lock:
+            return self._missing(key, retry_in_doubt)
+
+    def _missing(self, key, retry_in_doubt):
+        retry = {PENDING, FAILED, IN_DOUBT} if retry_in_doubt else {PENDING, FAILED}
+        entry = self._entries.get(key)
+        if entry is None:
+            return []
+        return [platform for platform, leg in entry["legs"].items()
+                if leg["status"] in retry and leg["attempts"] < MAX_ATTEMPTS]
+
+    def incomplete(self):
+        """Keys of posts with at least one leg that is not done yet and could still be retried."""
+        with self._lock:
+            return [key for key, entry in self._entries.items()
+                    if any(leg["status"] != DONE and leg["attempts"] < MAX_ATTEMPTS for leg in entry["legs"].values())]
+
+    def stats(self):
+        with self._lock:
+            legs = [leg["status"] for entry in self._entries.values() for leg in entry["legs"].values()]
+            return {
+                "posts": len(self._entries),
+                "lines": self._lines,
+                **{status: legs.count(status) for status in (PENDING, QUEUED, IN_DOUBT, DONE, FAILED)},
+            }
+
+
+def _is_settled(entry, cutoff):
+    """
+    True if no leg will ever be sent again: each one is done, has used up its
+    attempts, or has been in doubt since before `cutoff` (nobody came back to it).
+    """
+    return all(
+        leg["status"] == DONE
+        or (leg["status"] in (FAILED, IN_DOUBT) and leg["attempts"] >= MAX_ATTEMPTS)
+        or (leg["status"] == IN_DOUBT and (leg.get("attempted_at") or 0) < cutoff)
+        for leg in entry["legs"].values()
+    )
+
+
+def _unqueue(leg):
+    if leg["status"] == QUEUED:
+        leg["status"] = leg.pop("queued_from", PENDING)
+
+
+def _last_activity(entry):
+    return max([entry["created_at"]] + [leg.get("finished_at") or leg.get("attempted_at") or 0
+                                        for leg in entry["legs"].values()])
+
+
+_default_journal = None
+_default_journal_lock = threading.Lock()
+
+
+def get_default_journal():
+    global _default_journal
+    with _default_journal_lock:
+        if _default_journal is None:
+            _default_journal = PublishJournal()
+        return _default_journal
+
+
+def set_default_journal(journal):
+    """Swaps the process-wide journal (e.g. for a throwaway one in tests); returns the previous one."""
+    global _default_journal
+    with _default_journal_lock:
+        previous, _default_journal = _default_journal, journal
+        return previous
+
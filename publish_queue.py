@@ -0,0 +1,231 @@
+# publish_queue.py
+"""
+Outbound publishing queue that spends the quota X and Reddit report in their
+rate-limit headers (see rate_limit.get_rate_state) instead of finding the
+limit by running into 429s. The publisher plugins send their posts through it.
+
+Jobs are ordered by priority, then by deadline, then first come first served.
+A job only goes out while its endpoint has quota left and once its delay
+(e.g. subreddit pacing) is over; waiting jobs don't hold a worker. A 429 that
+still gets through puts the job back in the queue instead of losing the post.
+Endpoints are independent, so a full X quota doesn't hold up Reddit posts.
+
+Jobs run in a copy of the submitter's context, so a resilience.deadline()
+around submit() also bounds the send, and a job still queued when it runs
+out fails with resilience.NotSentError. The priority travels the same way:
+submit() without one uses the caller's at_priority(), which is how
+publisher.publish(priority=...) reaches the plugins' submits.
+"""
+
+import contextlib
+import contextvars
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import resilience
+from rate_limit import get_rate_state
+
+URGENT, NORMAL, BULK = 0, 5, 9
+DEFAULT_WORKERS = 24  # the X publisher's workers plus a full Reddit fan-out
+MAX_REQUEUES = 3
+DEFAULT_LATENCY = 1.0  # seconds per send, until a real one has been measured
+
+_priority = contextvars.ContextVar("publish_priority", default=NORMAL)
+
+
+@contextlib.contextmanager
+def at_priority(priority):
+    """Jobs submitted inside the block without a priority of their own get `priority`."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    deadline: float  # epoch seconds; inf for no deadline
+    seq: int
+    endpoint: str = field(compare=False)
+    func: object = field(compare=False)
+    args: tuple = field(compare=False)
+    kwargs: dict = field(compare=False)
+    not_before: float = field(compare=False, default=0.0)  # epoch seconds
+    context: contextvars.Context = field(compare=False, default_factory=contextvars.copy_context)
+    future: Future = field(compare=False, default_factory=Future)
+    requeues: int = field(compare=False, default=0)
+
+
+class PublishQueue:
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._pending = {}  # endpoint -> [_Job]
+        self._in_flight = 0
+        self._latency = {}  # endpoint -> moving average seconds per send
+        self._seq = itertools.count()
+        self._slots = threading.Semaphore(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._stopped = False
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, endpoint, func, *args, priority=None, deadline=None, delay=0.0, **kwargs):
+        """
+        Queues func(*args, **kwargs) against `endpoint`'s quota and returns a Future.
+        `priority` (URGENT, NORMAL, BULK; default: the caller's at_priority())
+        orders the queue. `deadline` (seconds from now; default: what is left
+        of the caller's resilience.deadline) marks a time-sensitive post: it is
+        sent before others of the same priority and dropped if it can't go out
+        in time. `delay` holds the job back for that many seconds.
+        """
+        if priority is None:
+            priority = _priority.get()
+        if deadline is None:
+            deadline = resilience.remaining_time()
+        now = time.time()
+        expires = now + deadline if deadline is not None else math.inf
+        job = _Job(priority, expires, next(self._seq), endpoint, func, args, kwargs, not_before=now + delay)
+        self._push(job)
+        return job.future
+
+    def _push(self, job):
+        with self._cond:
+            self._pending.setdefault(job.endpoint, []).append(job)
+            self._cond.notify_all()
+
+    def _next_ready(self):
+        """Best job that may go now, with its quota reserved, or (None, seconds until that may change)."""
+        now = time.time()
+        wait = math.inf
+        candidates = []
+        for endpoint, jobs in self._pending.items():
+            for job in [job for job in jobs if job.deadline < now or job.future.cancelled()]:
+                jobs.remove(job)
+                if not job.future.cancelled():
+                    job.future.set_exception(resilience.NotSentError(f"{endpoint} post missed its deadline before it was sent."))
+            ready = [job for job in jobs if job.not_before <= now]
+            if ready:
+                candidates.append(min(ready))
+            for job in jobs:
+                wait = min(wait, job.deadline - now, job.not_before - now if job.not_before > now else math.inf)
+        for job in sorted(candidates):
+            quota_wait = get_rate_state(job.endpoint).reserve()
+            if not quota_wait:
+                self._pending[job.endpoint].remove(job)
+                return job, None
+            wait = min(wait, quota_wait)
+        return None, None if wait == math.inf else max(0.0, wait)
+
+    def _dispatch_loop(self):
+        while True:
+            self._slots.acquire()
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        self._slots.release()
+                        return
+                    job, wait = self._next_ready()
+                    if job is not None:
+                        self._in_flight += 1
+                        break
+                    self._cond.wait(timeout=wait)
+            self._executor.submit(self._execute, job)
+
+    def _execute(self, job):
+        state = get_rate_state(job.endpoint)
+        start = time.perf_counter()
+        sent = True
+        try:
+            if job.requeues == 0 and not job.future.set_running_or_notify_cancel():
+                sent = False  # cancelled by the submitter just as it was picked
+                return
+            result = job.context.run(job.func, *job.args, **job.kwargs)
+        except Exception as e:
+            if resilience.status_code(e) == 429 and job.requeues < MAX_REQUEUES:
+                wait = resilience.retry_after(e)
+                state.exhaust(state.window if wait is None else wait)
+                job.requeues += 1
+                print(f"🟡 {job.endpoint} is rate limited, post re-queued.")
+                self._push(job)
+            else:
+                job.future.set_exception(e)
+        else:
+            job.future.set_result(result)
+        finally:
+            elapsed = time.perf_counter() - start
+            state.release(sent)
+            with self._cond:
+                if sent:
+                    previous = self._latency.get(job.endpoint)
+                    self._latency[job.endpoint] = elapsed if previous is None else 0.8 * previous + 0.2 * elapsed
+                self._in_flight -= 1
+                self._cond.notify_all()
+            self._slots.release()
+
+    def drain_estimate(self):
+        """Estimated seconds until every queued job has been sent, overall and per endpoint."""
+        now = time.time()
+        with self._cond:
+            pending = {endpoint: len(jobs) for endpoint, jobs in self._pending.items() if jobs}
+            latency = dict(self._latency)
+        endpoints = {}
+        for endpoint, count in pending.items():
+            quota = get_rate_state(endpoint).snapshot()
+            send_time = latency.get(endpoint, DEFAULT_LATENCY)
+            seconds = math.ceil(count / self.workers) * send_time
+            if quota["remaining"] is not None:
+                available = quota["remaining"]
+                if count > available:
+                    # The rest waits for the window to reset, as many windows as it takes.
+                    windows = math.ceil((count - available) / max(1, quota["limit"] or available or 1))
+                    window_wait = max(0.0, (quota["reset_at"] or now) - now)
+                    seconds = window_wait + (windows - 1) * get_rate_state(endpoint).window + send_time
+            endpoints[endpoint] = {"pending": count, "seconds": round(seconds, 1)}
+        return {"seconds": max((e["seconds"] for e in endpoints.values()), default=0.0), "endpoints": endpoints}
+
+    def stats(self):
+        with self._cond:
+            pending = {endpoint: len(jobs) for endpoint, jobs in self._pending.items()}
+            in_flight = self._in_flight
+        return {
+            "pending": pending,
+            "in_flight": in_flight,
+            "quota": {endpoint: get_rate_state(endpoint).snapshot() for endpoint in pending},
+        }
+
+    def join(self, timeout=None):
+        """Waits until nothing is queued or in flight; returns False on timeout."""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._in_flight or any(self._pending.values()):
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(timeout=remaining)
+        return True
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._executor.shutdown(wait=True)
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_default_queue():
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = PublishQueue()
+        return _default_queue
+
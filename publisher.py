@@ -0,0 +1,363 @@
+# publisher.py
+"""
+Publishes posts to every registered platform at the same time.
+
+Each platform is a Publisher plugin (twitter_client.TwitterPublisher,
+reddit_client.RedditPublisher, ...). A plugin declares how many calls it can
+run at once, how many drafts one call takes and how a draft is formatted for
+it. A plugin that posts each draft to several places (subreddits) lists them
+in destinations(). Each one is then a leg of its own ("reddit/python"), so a
+failure in one place is retried without posting again to the others.
+Plugins register themselves on import. PUBLISHER_PLUGINS in .env lists
+the modules to load, so a new platform plugs in without touching the
+pipeline.
+
+Every plugin gets its own workers, up to its concurrency limit, so a slow
+destination never takes slots from a fast one. Each call runs under the
+plugin's time budget (resilience.deadline), counted from when a worker picks
+it up. Every leg is recorded in the publish journal, so publishing the same
+drafts again only sends what hasn't gone out yet.
+
+publish(priority=URGENT) lets a time-sensitive post jump ahead: its batches
+get workers of their own, and the plugins' publish queue jobs inherit the
+priority (publish_queue.at_priority) without the plugins passing it on.
+"""
+
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+
+import requests
+
+import resilience
+from env_config import get_env
+from publish_journal import DONE, IN_DOUBT, QUEUED, get_default_journal
+from publish_queue import NORMAL, at_priority
+
+DEFAULT_PLUGINS = "twitter_client,reddit_client"  # comma-separated modules; override with PUBLISHER_PLUGINS
+DEFAULT_TIMEOUT = 60.0
+TIMEOUT_GRACE = 1.0  # extra wait for a leg to notice its deadline and record the outcome
+
+
+class Publisher:
+    """
+    A platform. Subclasses set `name` and implement publish(), or
+    publish_to() if they have destinations(). The class attributes tell the
+    engine how to schedule work for it.
+    """
+
+    name = None
+    max_concurrency = 1  # calls to publish() / publish_batch() running at the same time
+    batch_size = 1  # drafts handed to one publish_batch() call
+    # Seconds per call, retries included. The budget is cooperative: it is set as a
+    # resilience.deadline, which the HTTP layer and retries honour, but a plugin that
+    # blocks in other ways can overrun it. publish() then stops waiting for the call and
+    # reports it as timed out, while the call finishes and journals its real outcome.
+    timeout = DEFAULT_TIMEOUT
+
+    def format(self, text):
+        """Turns a draft into what this platform accepts. Runs before the draft is journaled."""
+        return text
+
+    def destinations(self):
+        """Places each draft goes to on this platform; empty for just one."""
+        return []
+
+    def publish(self, text):
+        """Posts one draft and returns its id, or None if nothing was posted."""
+        raise NotImplementedError
+
+    def publish_to(self, destination, text):
+        """Posts one draft to one of destinations() (None if there are none)."""
+        return self.publish(text)
+
+    def publish_batch(self, items):
+        """Posts several (destination, draft) pairs. Returns one id (or the exception) per pair, in order."""
+        results = []
+        for destination, text in items:
+            try:
+                results.append(self.publish_to(destination, text))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def legs(self):
+        """Journal leg names of one draft: the platform, or platform/destination for each destination."""
+        return [f"{self.name}/{destination}" for destination in self.destinations()] or [self.name]
+
+    def url(self, ref):
+        return ref
+
+
+_registry = {}
+_executors = {}  # (platform, urgent) -> ThreadPoolExecutor sized to the plugin's concurrency
+_registry_lock = threading.Lock()
+_plugins_loaded = False
+
+
+def register(publisher):
+    """Adds a Publisher instance to the registry (replacing one with the same name) and returns it."""
+    with _registry_lock:
+        _registry[publisher.name] = publisher
+        old = [_executors.pop((publisher.name, urgent), None) for urgent in (False, True)]
+    for executor in old:
+        if executor is not None:
+            executor.shutdown(wait=False)
+    return publisher
+
+
+def load_plugins():
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    for module in get_env("PUBLISHER_PLUGINS", DEFAULT_PLUGINS).split(","):
+        if module.strip():
+            importlib.import_module(module.strip())
+    _plugins_loaded = True
+
+
+def get_publisher(platform):
+    """The plugin for a platform or for one of its legs ("reddit/python")."""
+    load_plugins()
+    with _registry_lock:
+        return _registry.get(platform.split("/", 1)[0])
+
+
+def _destination(leg):
+    return leg.split("/", 1)[1] if "/" in leg else None
+
+
+def registered_platforms():
+    load_plugins()
+    with _registry_lock:
+        return list(_registry)
+
+
+def _executor_for(publisher, priority=NORMAL):
+    """The plugin's workers; posts above NORMAL priority have their own, so they never queue behind a backlog."""
+    key = (publisher.name, priority < NORMAL)
+    with _registry_lock:
+        if key not in _executors:
+            prefix = f"publish-{publisher.name}" + ("-urgent" if key[1] else "")
+            _executors[key] = ThreadPoolExecutor(max_workers=publisher.max_concurrency, thread_name_prefix=prefix)
+        return _executors[key]
+
+
+@dataclass
+class PlatformResult:
+    platform: str  # the leg: "twitter", "reddit/python", ...
+    ok: bool
+    ref: str = None  # tweet id, Reddit shortlink, ...
+    url: str = None
+    latency: float = 0.0  # seconds
+    error: str = None
+    skipped: bool = False  # already handled by an earlier publish of the same post
+    retryable: bool = False  # not posted, and publishing the same drafts again would try it
+
+    def summary(self):
+        if self.ok:
+            return f"✅ {self.platform}: {self.url} ({'posted earlier' if self.skipped else f'{self.latency:.1f}s'})"
+        return f"🔴 {self.platform}: {self.error}"
+
+
+@dataclass
+class _Batch:
+    publisher: Publisher
+    legs: list  # [(key, leg, text)]
+    timeout: float
+    queue_limit: float  # monotonic time by which a worker should have picked it up
+    priority: int = NORMAL  # publish_queue priority of the plugin's sends
+    future: object = None
+    started_at: float = None  # monotonic time a worker picked it up
+
+
+def _run_batch(journal, batch):
+    """Posts a batch of (key, leg, text) legs with one plugin call. Returns a PlatformResult per leg."""
+    batch.started_at = time.monotonic()
+    publisher, legs, timeout = batch.publisher, batch.legs, batch.timeout
+    for key, platform, _ in legs:
+        journal.record_attempt(key, platform)
+    items = [(_destination(platform), text) for _, platform, text in legs]
+    start = time.perf_counter()
+    try:
+        with resilience.deadline(timeout), at_priority(batch.priority):
+            outcomes = [publisher.publish_to(*items[0])] if len(items) == 1 else publisher.publish_batch(items)
+    except Exception as e:
+        outcomes = [e] * len(legs)
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for (key, platform, _), outcome in zip(legs, outcomes):
+        if outcome is None:
+            outcome = RuntimeError("nothing was posted")  # e.g. missing credentials
+        if not isinstance(outcome, Exception):
+            journal.record_result(key, platform, ref=str(outcome))
+            results.append(PlatformResult(platform, True, str(outcome), publisher.url(str(outcome)), elapsed))
+            continue
+        error = str(outcome) or type(outcome).__name__
+        # Also when a client wraps it (prawcore): a request that never went out can't be live
+        sent = not any(isinstance(e, resilience.NotSentError) for e in resilience.wrapped_errors(outcome))
+        if sent and (isinstance(outcome, (TimeoutError, requests.ReadTimeout)) or elapsed >= timeout):
+            # The request may have reached the platform before we stopped waiting:
+            # leave the leg in doubt rather than risk posting it twice.
+            results.append(PlatformResult(platform, False, latency=elapsed,
+                                          error=f"timed out, the post may still have gone out ({error})"))
+            continue
+        journal.record_result(key, platform, error=error)
+        results.append(PlatformResult(platform, False, latency=elapsed, error=error))
+    return results
+
+
+def _journaled_result(platform, leg):
+    """Result for a leg that is not being sent this time, from what the journal knows."""
+    publisher = get_publisher(platform)
+    if leg["status"] == DONE:
+        url = publisher.url(leg.get("ref")) if publisher else leg.get("ref")
+        return PlatformResult(platform, True, leg.get("ref"), url, skipped=True)
+    if publisher is None:
+        error = f"no publisher registered for {platform}"
+    elif leg["status"] == QUEUED:
+        error = "already queued by another publish of the same post"
+    elif leg["status"] == IN_DOUBT:
+        error = "an earlier attempt timed out or was interrupted; check the platform before retrying"
+    else:
+        error = f"gave up after {leg['attempts']} attempts: {leg.get('error')}"
+    return PlatformResult(platform, False, leg.get("ref"), error=error, skipped=True)
+
+
+def publish_legs(keys, journal=None, timeouts=None, retry_in_doubt=False, priority=NORMAL):
+    """
+    Sends the legs of the journal entries `keys` that haven't gone out. The
+    legs are grouped per plugin into batches of its batch_size and run on the
+    plugin's own workers, all plugins at once. `priority` is a publish_queue
+    priority (URGENT, NORMAL, BULK).
+    Returns {key: {platform: PlatformResult}}.
+    """
+    journal = journal or get_default_journal()
+    timeouts = timeouts or {}
+    entries = {key: journal.entry(key) for key in keys}
+
+    todo = {}  # plugin name -> [(key, leg, text)]
+    for key, entry in entries.items():
+        for platform in journal.claim_legs(key, retry_in_doubt):
+            publisher = get_publisher(platform)
+            if publisher is None:
+                journal.release(key, platform)
+                continue
+            todo.setdefault(publisher.name, []).append((key, platform, entry["drafts"][platform]))
+
+    batches = []
+    for name, legs in todo.items():
+        publisher = get_publisher(name)
+        timeout = timeouts.get(name, publisher.timeout)
+        executor = _executor_for(publisher, priority)
+        queued_at = time.monotonic()
+        for n, i in enumerate(range(0, len(legs), publisher.batch_size)):
+            rounds = n // publisher.max_concurrency + 1  # its own round plus the rounds of this publish ahead of it
+            batch = _Batch(publisher, legs[i:i + publisher.batch_size], timeout, queued_at + rounds * timeout, priority)
+            batch.future = executor.submit(_run_batch, journal, batch)
+            batches.append(batch)
+
+    results = {key: {} for key in entries}
+    for batch in batches:
+        for (key, platform, _), result in zip(batch.legs, _wait_for(journal, batch)):
+            results[key][platform] = result
+    for key, entry in entries.items():
+        for platform, leg in entry["legs"].items():
+            if platform not in results[key]:
+                results[key][platform] = _journaled_result(platform, leg)
+        missing = journal.missing_legs(key)
+        for platform, result in results[key].items():
+            result.retryable = not result.ok and platform in missing
+    return results
+
+
+def _wait_for(journal, batch):
+    """
+    Waits for a batch to finish. A batch gets `timeout` seconds from when a
+    worker picks it up. One that is still queued at its queue_limit is
+    cancelled and its legs handed back to the journal unsent.
+    """
+    while True:
+        started = batch.started_at
+        give_up_at = (batch.queue_limit if started is None else started + batch.timeout) + TIMEOUT_GRACE
+        try:
+            return batch.future.result(timeout=max(0.0, give_up_at - time.monotonic()))
+        except FutureTimeout:
+            if started is not None:
+                # The batch keeps running and still records its outcome in the journal.
+                return [PlatformResult(platform, False, latency=time.monotonic() - started,
+                                       error=f"timed out after {batch.timeout:g}s, the post may still go out")
+                        for _, platform, _ in batch.legs]
+            if not batch.future.cancel():
+                continue  # a worker just picked it up; it gets its full time budget from now
+            for key, platform, _ in batch.legs:
+                journal.release(key, platform)
+            return [PlatformResult(platform, False, error="not sent: no free worker in time, publish again to retry")
+                    for _, platform, _ in batch.legs]
+
+
+def split_results(results):
+    """
+    Sorts {platform: PlatformResult} into three platform lists: posted by this
+    call, posted by an earlier one (nothing new went out), and not posted.
+    """
+    posted = [platform for platform, result in results.items() if result.ok and not result.skipped]
+    earlier = [platform for platform, result in results.items() if result.ok and result.skipped]
+    failed = [platform for platform, result in results.items() if not result.ok]
+    return posted, earlier, failed
+
+
+def format_drafts(drafts):
+    """
+    Runs each draft ({platform: text}) through its plugin's format step and
+    returns one draft per leg ({"twitter": ..., "reddit/python": ...}).
+    """
+    formatted = {}
+    for platform, text in drafts.items():
+        publisher = get_publisher(platform)
+        if publisher is None or "/" in platform:
+            formatted[platform] = publisher.format(text) if publisher else text
+            continue
+        for leg in publisher.legs():
+            formatted[leg] = publisher.format(text)
+    return formatted
+
+
+def publish_many(draft_sets, journal=None, timeouts=None, retry_in_doubt=False, priority=NORMAL):
+    """
+    Publishes many posts ([{platform: text}, ...]) in one go, scheduled across
+    all plugins. Returns [(idempotency key, {platform: PlatformResult})] in order.
+    """
+    journal = journal or get_default_journal()
+    keys = [journal.begin(format_drafts(drafts)) for drafts in draft_sets]
+    results = publish_legs(dict.fromkeys(keys), journal, timeouts, retry_in_doubt, priority)
+    return [(key, results[key]) for key in keys]
+
+
+def publish(drafts, key=None, journal=None, timeouts=None, retry_in_doubt=False, nonce=None, priority=NORMAL):
+    """
+    Posts `drafts` ({platform: text}) to all their platforms concurrently.
+    Returns (idempotency key, {leg: PlatformResult}); a leg is a platform, or
+    one of its destinations ("reddit/python"). Pass the `nonce` of a generated
+    draft so the same text generated again still counts as a new post, and
+    priority=publish_queue.URGENT for a post someone is waiting on.
+    """
+    journal = journal or get_default_journal()
+    key = journal.begin(format_drafts(drafts), key, nonce)
+    return key, publish_legs([key], journal, timeouts, retry_in_doubt, priority)[key]
+
+
+def drafts_for(texts, fallback):
+    """One draft per registered platform: its own text from `texts` if there is one, else `fallback`."""
+    return {platform: texts.get(platform) or fallback for platform in registered_platforms()}
+
+
+def resume_incomplete(journal=None, timeouts=None, retry_in_doubt=False):
+    """Finishes the posts a crash or failure left half-published. Returns {key: {platform: PlatformResult}}."""
+    journal = journal or get_default_journal()
+    keys = [key for key in journal.incomplete() if journal.missing_legs(key, retry_in_doubt)]
+    return publish_legs(keys, journal, timeouts, retry_in_doubt) if keys else {}
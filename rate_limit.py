@@ -0,0 +1,167 @@
+# rate_limit.py
+"""
+Token bucket used to pace outbound API calls to a provider quota.
+Works from threads (acquire) and from asyncio code (acquire_async).
+
+RateLimitState tracks the quota a provider reports in its response headers;
+get_rate_state() holds one per endpoint, filled in by the X and Reddit clients.
+"""
+
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Allows `rate` tokens per `per` seconds with bursts of up to `capacity`.
+    consume() may push the balance below zero, e.g. when a request turned out
+    to use more tokens than estimated; later callers then wait off the debt.
+    """
+
+    def __init__(self, rate, per=60.0, capacity=None):
+        self.rate = rate / per  # tokens per second
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """Takes `tokens` and returns 0 if available, else the seconds to wait before retrying."""
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def consume(self, tokens):
+        """Adjusts the balance without waiting (negative values give tokens back)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - tokens)
+
+    def acquire(self, tokens=1, timeout=None):
+        """Waits for `tokens`; returns False, without taking them, if that would take longer than `timeout`."""
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return True
+            if end is not None and time.monotonic() + wait > end:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1, timeout=None):
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return True
+            if end is not None and time.monotonic() + wait > end:
+                return False
+            await asyncio.sleep(wait)
+
+    def available(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class RateLimitState:
+    """
+    Quota of one endpoint as last reported by the provider: X's x-rate-limit-*
+    headers (reset as an epoch) or Reddit's x-ratelimit-* headers (reset in
+    seconds). reserve() spends a unit locally, so concurrent senders don't all
+    spend the same last unit of quota; each response's headers then correct
+    the count, minus the requests still in flight that the header can't know about.
+    """
+
+    def __init__(self, endpoint, window):
+        self.endpoint = endpoint
+        self.window = window  # seconds per quota window, used for drain estimates
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def update(self, remaining, reset_at, limit=None):
+        with self._lock:
+            # The response carrying these headers is one of the reserved requests;
+            # the others in flight will still spend a unit each.
+            self.remaining = max(0, remaining - max(0, self.in_flight - 1))
+            self.reset_at = reset_at
+            if limit is not None:
+                self.limit = limit
+
+    def update_from_headers(self, headers):
+        """Reads the rate-limit headers of a response; returns False if it had none."""
+        try:
+            if "x-rate-limit-remaining" in headers:
+                self.update(int(headers["x-rate-limit-remaining"]), float(headers["x-rate-limit-reset"]),
+                            int(headers["x-rate-limit-limit"]) if "x-rate-limit-limit" in headers else None)
+                return True
+            if "x-ratelimit-remaining" in headers:
+                remaining = int(float(headers["x-ratelimit-remaining"]))
+                used = int(float(headers.get("x-ratelimit-used", 0)))
+                self.update(remaining, time.time() + float(headers["x-ratelimit-reset"]), remaining + used)
+                return True
+        except (KeyError, ValueError):
+            pass
+        return False
+
+    def _expire(self, now):
+        if self.reset_at is not None and now >= self.reset_at:
+            # The window rolled over; assume a full quota until the next response says otherwise.
+            self.remaining = self.limit
+            self.reset_at = now + self.window if self.limit is not None else None
+
+    def reserve(self):
+        """Claims one request; returns 0 if it may go now, else the seconds until quota frees up."""
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            if self.remaining is None or self.remaining > 0:
+                if self.remaining is not None:
+                    self.remaining -= 1
+                self.in_flight += 1
+                return 0.0
+            return max(0.05, (self.reset_at or now + 1.0) - now)
+
+    def release(self, sent=True):
+        """Ends a reservation; `sent=False` gives its unit back (the request never went out)."""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if not sent and self.remaining is not None:
+                self.remaining += 1
+
+    def exhaust(self, retry_after):
+        """Records a 429: no quota until `retry_after` seconds from now."""
+        with self._lock:
+            self.remaining = 0
+            self.reset_at = time.time() + retry_after
+
+    def snapshot(self):
+        with self._lock:
+            self._expire(time.time())
+            return {"limit": self.limit, "remaining": self.remaining, "reset_at": self.reset_at,
+                    "in_flight": self.in_flight}
+
+
+# Quota windows of the endpoints we publish to.
+RATE_LIMIT_WINDOWS = {"x.create_tweet": 15 * 60, "reddit.submit": 10 * 60}
+_rate_states = {}
+_rate_states_lock = threading.Lock()
+
+
+def get_rate_state(endpoint):
+    with _rate_states_lock:
+        if endpoint not in _rate_states:
+            _rate_states[endpoint] = RateLimitState(endpoint, RATE_LIMIT_WINDOWS.get(endpoint, 60))
+        return _rate_states[endpoint]
@@ -1,28 +1,158 @@
 # file: reddit_auto_post_bot.py
-import os
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+
 import praw
-from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
+import resilience
+from env_config import get_env
+from publish_queue import get_default_queue
+from publisher import Publisher, register
+from rate_limit import get_rate_state
 
-load_dotenv()
-# Replace with your Reddit app credentials
-id=os.getenv("YOUR_CLIENT_ID")
-secret=os.getenv("YOUR_CLIENT_SECRET")
-user_name=os.getenv("YOUR_REDDIT_USERNAME")
-password_=os.getenv("YOUR_REDDIT_PASSWORD")
 userAgent="python:reddit.auto.poster:v1.0 (by u/Different-Sugar-8262)"  # e.g., 'python:reddit.auto.poster:v1.0 (by u/yourusername)'
 
+DEFAULT_SUBREDDITS = "test"  # comma-separated; override with REDDIT_SUBREDDITS in .env
+REDDIT_POOL_MAXSIZE = 20  # keep-alive connections shared by the queue workers' praw instances
+SUBREDDIT_MIN_INTERVAL = 10.0  # seconds between two posts to the same subreddit (REDDIT_SUBREDDIT_INTERVAL)
+REDDIT_TITLE_LIMIT = 300
+REDDIT_TIMEOUT = 60  # seconds per batch of subreddit posts, pacing and retries included
+
+
+class MissingCredentialsError(ValueError):
+    pass
+
+
+def _read_credentials():
+    credentials = (
+        get_env("YOUR_CLIENT_ID"),
+        get_env("YOUR_CLIENT_SECRET"),
+        get_env("YOUR_REDDIT_USERNAME"),
+        get_env("YOUR_REDDIT_PASSWORD"),
+        # REDDIT_OAUTH_URL / REDDIT_URL point praw at another server (e.g. the
+        # load-test fakes in fake_services.py).
+        get_env("REDDIT_OAUTH_URL"),
+        get_env("REDDIT_URL"),
+    )
+    if not all(credentials[:4]):
+        raise MissingCredentialsError("Missing one or more Reddit credentials in the .env file.")
+    return credentials
 
-def create_reddit_instance():
+
+def configured_subreddits():
+    """Subreddits to post to, from REDDIT_SUBREDDITS (comma-separated)."""
+    names = get_env("REDDIT_SUBREDDITS", DEFAULT_SUBREDDITS)
+    return [name.strip().removeprefix("r/") for name in names.split(",") if name.strip()]
+
+
+def create_reddit_instance(credentials=None, session=None):
+    client_id, client_secret, username, password, oauth_url, reddit_url = credentials or _read_credentials()
+    overrides = {key: value for key, value in (("oauth_url", oauth_url), ("reddit_url", reddit_url)) if value}
+    if session is not None:
+        overrides["requestor_kwargs"] = {"session": session}
     return praw.Reddit(
-        client_id=id,
-        client_secret=secret,
-        username=user_name,
-        password=password_,
-        user_agent=userAgent
+        client_id=client_id,
+        client_secret=client_secret,
+        username=username,
+        password=password,
+        user_agent=userAgent,
+        **overrides
     )
 
 
+class RedditSessionHolder:
+    """
+    praw.Reddit instances are not thread-safe, so each thread gets its own,
+    created on first use and kept for later posts. They all share one pooled
+    requests.Session, so the HTTP connections stay warm. The instances are
+    rebuilt when the credentials in .env change or after an auth error.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._credentials = None
+        self._session = None
+
+    def get(self):
+        credentials = _read_credentials()
+        with self._lock:
+            if credentials != self._credentials:
+                self._credentials = credentials
+                self._session = resilience.DeadlineSession()  # praw passes its own timeout
+                self._session.mount("https://", HTTPAdapter(pool_maxsize=REDDIT_POOL_MAXSIZE))
+                self._session.mount("http://", HTTPAdapter(pool_maxsize=REDDIT_POOL_MAXSIZE))
+                self._generation += 1
+            generation, session = self._generation, self._session
+        if getattr(self._local, "generation", None) != generation:
+            self._local.reddit = create_reddit_instance(credentials, session)
+            self._local.generation = generation
+        return self._local.reddit
+
+    def invalidate(self):
+        with self._lock:
+            self._credentials = None
+
+
+_sessions = RedditSessionHolder()
+
+
+def get_reddit():
+    return _sessions.get()
+
+
+class SubredditPacer:
+    """
+    Spaces out posts to the same subreddit by at least `interval` seconds
+    (default: REDDIT_SUBREDDIT_INTERVAL from .env, else SUBREDDIT_MIN_INTERVAL).
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval
+        self._next_slot = {}  # subreddit -> monotonic time of its next free slot
+        self._lock = threading.Lock()
+
+    def reserve(self, subreddit, max_wait=None):
+        """
+        Books the subreddit's next slot; returns the seconds to wait for it.
+        Returns None without booking if that would be longer than `max_wait`.
+        """
+        interval = self.interval
+        if interval is None:
+            interval = float(get_env("REDDIT_SUBREDDIT_INTERVAL", SUBREDDIT_MIN_INTERVAL))
+        now = time.monotonic()
+        with self._lock:
+            slot = max(now, self._next_slot.get(subreddit.lower(), now))
+            if max_wait is not None and slot - now > max_wait:
+                return None
+            self._next_slot[subreddit.lower()] = slot + interval
+        return slot - now
+
+
+_pacer = SubredditPacer()
+
+
+def record_rate_limit(reddit):
+    """Copies the quota praw read from Reddit's x-ratelimit-* headers into rate_limit."""
+    limits = reddit.auth.limits
+    if limits.get("remaining") is not None and limits.get("reset_timestamp"):
+        get_rate_state("reddit.submit").update(
+            int(limits["remaining"]), limits["reset_timestamp"], int(limits["remaining"] + (limits.get("used") or 0))
+        )
+
+
+def make_title(text):
+    """First line of the post, cut to Reddit's title limit."""
+    first_line = next((line.strip() for line in text.splitlines() if line.strip()), "")
+    if len(first_line) > REDDIT_TITLE_LIMIT:
+        first_line = first_line[:REDDIT_TITLE_LIMIT - 1].rstrip() + "…"
+    return first_line
+
+
 def submit_text_post(reddit, subreddit_name, title, body):
     subreddit = reddit.subreddit(subreddit_name)
     return subreddit.submit(title=title, selftext=body)
@@ -33,24 +163,114 @@ def submit_text_post(reddit, subreddit_name, title, body):
 #     return subreddit.submit(title=title, url=url)
 
 
-def post_reddit(text_to_post):
-    reddit = create_reddit_instance()
+@dataclass
+class SubredditResult:
+    subreddit: str
+    shortlink: str = None
+    error: str = None
+    latency: float = 0.0  # seconds, pacing included
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _submit(subreddit_name, title, body):
+    reddit = get_reddit()
+    try:
+        post = resilience.call("reddit.submit", submit_text_post, reddit, subreddit_name, title, body,
+                               policy=resilience.PUBLISH_POLICY)
+    except Exception as e:
+        if resilience.status_code(e) == 401:
+            _sessions.invalidate()  # rebuilt with fresh credentials on the next post
+        raise
+    finally:
+        record_rate_limit(reddit)
+    return post.shortlink
+
+
+def _queue_submits(posts, title=None):
+    """
+    Queues one submit per (subreddit, text) on the publish queue and returns
+    their futures, in order. Pacing waits are served by the queue, so they
+    hold no worker; a subreddit whose next slot lies past the caller's
+    resilience.deadline fails right away with NotSentError instead.
+    """
+    futures = []
+    for subreddit, text in posts:
+        wait = _pacer.reserve(subreddit, max_wait=resilience.remaining_time())
+        if wait is None:
+            future = Future()
+            future.set_exception(resilience.NotSentError(f"r/{subreddit} is paced past the deadline, not posted."))
+        else:
+            # Each submit runs in a copy of the caller's context, so a resilience.deadline() applies to it too.
+            future = get_default_queue().submit("reddit.submit", _submit, subreddit, title or make_title(text), text,
+                                                delay=wait)
+        futures.append(future)
+    return futures
+
+
+def post_to_subreddits(text_to_post, subreddits=None, title=None):
+    """
+    Submits one text post to every subreddit at once (configured_subreddits()
+    by default) and returns a SubredditResult per subreddit, in order.
+    """
+    subreddits = subreddits or configured_subreddits()
+    start = time.perf_counter()
+    futures = _queue_submits([(name, text_to_post) for name in subreddits], title)
+    results = []
+    for name, future in zip(subreddits, futures):
+        error = future.exception()
+        if error is None:
+            results.append(SubredditResult(name, shortlink=future.result(), latency=time.perf_counter() - start))
+        else:
+            results.append(SubredditResult(name, error=str(error) or type(error).__name__,
+                                           latency=time.perf_counter() - start))
+    for result in results:
+        if result.ok:
+            print(f"✅ r/{result.subreddit}: {result.shortlink} ({result.latency:.1f}s)")
+        else:
+            print(f"🔴 r/{result.subreddit}: {result.error}")
+    return results
+
+
+def post_reddit(text_to_post, subreddits=None):
+    """
+    Posts to the configured subreddits and returns the first shortlink.
+    Raises if any subreddit did not accept the post; the error lists which ones did.
+    """
+    results = post_to_subreddits(text_to_post, subreddits)
+    posted = [result for result in results if result.ok]
+    failed = [result for result in results if not result.ok]
+    if failed:
+        details = "; ".join(f"r/{result.subreddit}: {result.error}" for result in failed)
+        if posted:
+            details += " (posted to " + ", ".join(f"r/{result.subreddit}" for result in posted) + ")"
+        raise RuntimeError(details)
+    print(f"Post submitted: {posted[0].shortlink}")
+    return posted[0].shortlink
+
+
+class RedditPublisher(Publisher):
+    """One leg per subreddit ("reddit/python"), so a failed subreddit is retried on its own."""
+
+    name = "reddit"
+    max_concurrency = 4
+    batch_size = REDDIT_POOL_MAXSIZE  # a post's subreddits go out together; pacing waits sit in the queue
+    timeout = REDDIT_TIMEOUT
+
+    def destinations(self):
+        return configured_subreddits()
+
+    def format(self, text):
+        return text.strip()
 
-    subreddit_name = "test"  # Change this to your desired subreddit
-    post_type = "Technology"  # or 'link', you can change this as needed
-    title = text_to_post
-    body = "text_to_post"    
+    def publish_to(self, subreddit, text):
+        return _queue_submits([(subreddit, text)])[0].result()
 
-    if post_type == 'Technology':
-        # body = input("Post body text: ").strip()
-        post = submit_text_post(reddit, subreddit_name, title, body)
-        print(reddit, subreddit_name, title, body)
-    
-    else:
-        print("Invalid post type.")
-        exit()
+    def publish_batch(self, items):
+        futures = _queue_submits(items)
+        return [future.exception() or future.result() for future in futures]
 
-    print(f"Post submitted: {post.shortlink}")
-    print(reddit, subreddit_name, title, body)
 
-   
\ No newline at end of file
+register(RedditPublisher())
@@ -0,0 +1,340 @@
+# resilience.py
+"""
+Shared retry, backoff and circuit-breaker layer for the outbound clients
+(Gemini, X, Reddit).
+
+- Retries use full-jitter exponential backoff and honour Retry-After and
+  rate-limit reset headers when the provider sends them.
+- Each endpoint has a circuit breaker. After repeated provider-side failures
+  it opens, and calls fail immediately with CircuitOpenError instead of
+  queueing behind a provider that is down.
+- `with deadline(seconds):` sets a time budget for everything inside it. Retries
+  stop when the budget runs out, and request_timeout() hands the remaining
+  time to the HTTP clients.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class NotSentError(RuntimeError):
+    """The request never went out (e.g. it expired in a queue), so retrying it can't post twice."""
+
+
+class DeadlineExceeded(NotSentError):
+    """The deadline ran out before the request was sent."""
+
+
+# --- deadlines -----------------------------------------------------------------
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """Bounds everything inside the block to `seconds`; nested deadlines can only shorten it."""
+    new = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(new if current is None else min(current, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time():
+    """Seconds left before the current deadline, or None without one."""
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def request_timeout(default):
+    """Per-request timeout: `default`, shortened to fit the current deadline."""
+    remaining = remaining_time()
+    if remaining is None:
+        return default
+    if remaining <= 0:
+        raise DeadlineExceeded("Deadline exceeded before the request was sent.")
+    return min(default, remaining)
+
+
+class DeadlineSession(requests.Session):
+    """requests.Session whose requests are cut short by the current deadline()."""
+
+    def __init__(self, default_timeout=30.0):
+        super().__init__()
+        self.default_timeout = default_timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs["timeout"] = request_timeout(kwargs.get("timeout") or self.default_timeout)
+        return super().request(method, url, **kwargs)
+
+
+# --- error classification --------------------------------------------------------
+
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+def wrapped_errors(exc):
+    """
+    `exc` followed by the errors it wraps: prawcore keeps the real one in
+    `original_exception`, others chain it with `raise ... from`.
+    """
+    chain = []
+    while isinstance(exc, BaseException) and len(chain) < 8 and not any(exc is seen for seen in chain):
+        chain.append(exc)
+        exc = getattr(exc, "original_exception", None) or exc.__cause__
+    return chain
+
+
+def status_code(exc):
+    """HTTP status carried by a requests / tweepy / prawcore / google-api-core exception."""
+    for error in wrapped_errors(exc):
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None) or getattr(response, "status", None)
+        if status is None:
+            code = getattr(error, "code", None)  # google.api_core.exceptions.GoogleAPICallError
+            status = code if isinstance(code, int) else None
+        if status is not None:
+            return status
+    return None
+
+
+def retry_after(exc):
+    """Seconds the provider asked us to wait, from the response headers, or None."""
+    explicit = getattr(exc, "retry_after", None)
+    if isinstance(explicit, (int, float)):
+        return float(explicit)
+    response = next((getattr(e, "response", None) for e in wrapped_errors(exc)
+                     if getattr(e, "response", None) is not None), None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    # Reset headers come with every response; they only mean "wait" once the quota is used up.
+    remaining = headers.get("x-rate-limit-remaining") or headers.get("x-ratelimit-remaining")
+    if status_code(exc) != 429 and remaining not in ("0", "0.0"):
+        return None
+    reset = headers.get("x-rate-limit-reset")  # X: epoch seconds
+    if reset:
+        try:
+            return max(0.0, float(reset) - time.time())
+        except ValueError:
+            pass
+    reset = headers.get("x-ratelimit-reset")  # Reddit: seconds until the window resets
+    if reset:
+        try:
+            return max(0.0, float(reset))
+        except ValueError:
+            pass
+    return None
+
+
+def _is_connection_error(exc):
+    chain = wrapped_errors(exc)
+    if any(isinstance(error, DeadlineExceeded) for error in chain):
+        return False
+    return any(isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError))
+               for error in chain)
+
+
+def _never_connected(exc):
+    """True when no connection was made at all, so the provider cannot have seen the request."""
+    for error in wrapped_errors(exc):
+        if isinstance(error, (requests.ConnectTimeout, NewConnectionError, ConnectionRefusedError)):
+            return True
+        # requests.ConnectionError wraps urllib3's MaxRetryError, which keeps the cause in .reason
+        if error.args and isinstance(getattr(error.args[0], "reason", None), NewConnectionError):
+            return True
+    return False
+
+
+def is_provider_failure(exc):
+    """True for errors that say something about the provider's health (5xx, 429, network)."""
+    status = status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    return _is_connection_error(exc)
+
+
+# --- retry policy --------------------------------------------------------------------
+
+class RetryPolicy:
+    """
+    `idempotent=False` is for calls that must not run twice, like publishing a
+    post. Only errors where the request provably was not processed are retried
+    then: rate limiting (429) and failing to connect at all (refused, DNS, connect
+    timeout), also when a client library wraps them (prawcore).
+    """
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=30.0, idempotent=True):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.idempotent = idempotent
+
+    def should_retry(self, exc):
+        if self.idempotent:
+            return is_provider_failure(exc)
+        return status_code(exc) == 429 or _never_connected(exc)
+
+    def delay(self, attempt, exc):
+        hinted = retry_after(exc)
+        if hinted is not None:
+            return min(hinted, self.max_delay * 4)
+        # Full jitter: spreads retries from many workers over the whole window.
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+DEFAULT_POLICY = RetryPolicy()
+PUBLISH_POLICY = RetryPolicy(max_attempts=3, idempotent=False)
+
+
+# --- circuit breaker -------------------------------------------------------------------
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.name} is unavailable (circuit open), failing fast.")
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                # Let a single trial request through to probe the provider.
+                if self._trial_running:
+                    raise CircuitOpenError(f"{self.name} is being probed (circuit half-open), failing fast.")
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def abandon_call(self):
+        """The call was interrupted (cancelled, Ctrl+C) before it could tell anything about the provider."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self, exc):
+        with self._lock:
+            self._trial_running = False
+            if not is_provider_failure(exc) or status_code(exc) == 429:
+                # The provider answered; a bad request or a used-up quota says nothing
+                # about its health (429s are paced by retry_after / rate_limit instead).
+                if self.state == self.HALF_OPEN:
+                    self.state = self.CLOSED
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(endpoint):
+    with _breakers_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint)
+        return _breakers[endpoint]
+
+
+def breaker_states():
+    with _breakers_lock:
+        return {name: breaker.state for name, breaker in _breakers.items()}
+
+
+# --- entry points --------------------------------------------------------------------------
+
+def _next_delay(policy, attempt, exc):
+    """Seconds to sleep before the next attempt, or None to give up and re-raise."""
+    if attempt + 1 >= policy.max_attempts or not policy.should_retry(exc):
+        return None
+    delay = policy.delay(attempt, exc)
+    remaining = remaining_time()
+    if remaining is not None and delay >= remaining:
+        return None
+    return delay
+
+
+def call(endpoint, func, *args, policy=DEFAULT_POLICY, **kwargs):
+    """Runs func(*args, **kwargs) behind the endpoint's circuit breaker, retrying per `policy`."""
+    breaker = get_breaker(endpoint)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            breaker.record_failure(e)
+            delay = _next_delay(policy, attempt, e)
+            if delay is None:
+                raise
+            print(f"🟡 {endpoint} failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        except BaseException:
+            # Cancelled or interrupted: free the half-open trial slot, or the breaker would fail fast forever.
+            breaker.abandon_call()
+            raise
+        breaker.record_success()
+        return result
+
+
+async def acall(endpoint, func, *args, policy=DEFAULT_POLICY, **kwargs):
+    """Async counterpart of call(); `func` returns an awaitable."""
+    breaker = get_breaker(endpoint)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            breaker.record_failure(e)
+            delay = _next_delay(policy, attempt, e)
+            if delay is None:
+                raise
+            print(f"🟡 {endpoint} failed ({e}), retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        except BaseException:
+            # Cancelled or interrupted: free the half-open trial slot, or the breaker would fail fast forever.
+            breaker.abandon_call()
+            raise
+        breaker.record_success()
+        return result
@@ -0,0 +1,115 @@
+# response_cache.py
+"""
+Cache for model responses: an in-memory LRU with TTL, optionally backed by a
+SQLite file so entries survive restarts and are shared between processes.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_TTL = 3600
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_DISK_ENTRIES = 10_000
+
+
+def make_cache_key(model_name, template_id, prompt, params=None):
+    """
+    Key for one generation request. The full prompt is hashed (not just the
+    user input) so editing a template automatically misses the old entries.
+    """
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    params_json = json.dumps(params or {}, sort_keys=True)
+    return hashlib.sha256(f"{model_name}\0{template_id}\0{prompt_hash}\0{params_json}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL,
+                 disk_path=None, max_disk_entries=DEFAULT_MAX_DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (value, created_at, latency)
+        self._db = None
+        if disk_path:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(disk_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, latency REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+            self._db.commit()
+
+    def _remember(self, key, item):
+        self._memory[key] = item
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None and now - item[1] > self.ttl:
+                del self._memory[key]
+                item = None
+            if item is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at, latency FROM responses WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl),
+                ).fetchone()
+                if row is not None:
+                    item = tuple(row)
+                    self._remember(key, item)
+                    self.disk_hits += 1
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.latency_saved += item[2]
+            return item[0]
+
+    def put(self, key, value, latency=0.0):
+        item = (value, time.time(), latency)
+        with self._lock:
+            self._remember(key, item)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, *item))
+                self._db.execute(
+                    "DELETE FROM responses WHERE created_at < ? OR key IN ("
+                    " SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (item[1] - self.ttl, self.max_disk_entries),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "latency_saved_s": round(self.latency_saved, 3),
+            }
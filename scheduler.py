@@ -2,11 +2,23 @@
 """
 Scheduler for the AI-powered Twitter/Reddit bot.
 This module handles automatic scheduling of posts using APScheduler.
+
+It runs headless: jobs go draft -> validate -> publish with no GUI imports,
+so it works on a server. `python scheduler.py --gui` also opens the editor
+(app.py) while the jobs run in the background, and `--once` runs one job and
+exits.
 """
 
+import time
+
+_STARTED = time.perf_counter()  # startup time is measured from here
+
+import argparse
 import logging
 import sys
+from collections import deque
 from datetime import datetime, timedelta
+from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
@@ -14,10 +26,11 @@ import atexit
 import signal
 
 # Import our bot functions
-from twitter_client import post_tweet
-from gemini_client import generate_post_from_prompt
-from reddit_client import post_reddit
-from app import App
+from gemini_client import fit_draft, generate_post_from_prompt
+from draft_buffer import DEFAULT_REFILL_MINUTES, DraftBuffer, DraftPrefetcher, is_postable
+from publish_journal import new_nonce
+from publish_queue import get_default_queue
+from publisher import drafts_for, publish, resume_incomplete, split_results
 
 # Configure logging
 logging.basicConfig(
@@ -31,9 +44,13 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+JOB_TIMINGS_KEPT = 100
+
 class BotScheduler:
-    def __init__(self):
-        self.scheduler = BlockingScheduler()
+    def __init__(self, background=False):
+        # A background scheduler leaves the main thread free, e.g. for the GUI
+        self.scheduler = BackgroundScheduler() if background else BlockingScheduler()
+        self.job_timings = deque(maxlen=JOB_TIMINGS_KEPT)  # seconds per stage of recent jobs
         self.prompts = [
             """
             The tweet should be about the importance of embracing change and constantly learning new skills (both technical and soft skills).
@@ -64,42 +81,143 @@ class BotScheduler:
             """
         ]
         self.current_prompt_index = 0
+        # Drafts are generated ahead of time so a post job only has to dequeue one
+        self.draft_buffer = DraftBuffer()
+        self.prefetcher = DraftPrefetcher(
+            self.draft_buffer,
+            {self._prompt_key(i): prompt for i, prompt in enumerate(self.prompts)},
+        )
+        self._refill_thread = None
+
+    @staticmethod
+    def _prompt_key(index):
+        return f"prompt-{index}"
+
+    def next_draft(self):
+        """
+        (text, nonce) for the next post: a buffered draft if one is ready, else
+        generated inline. The nonce goes into the post's idempotency key.
+        """
+        index = self.current_prompt_index
+        self.current_prompt_index = (self.current_prompt_index + 1) % len(self.prompts)
+
+        draft = self.draft_buffer.pop(self._prompt_key(index))
+        # Top the queue back up right away instead of waiting for the next refill run
+        self._refill_thread = self.prefetcher.refill_in_background()
+        if draft:
+            logger.info(f"Using buffered draft for prompt {index} ({time.time() - draft['created_at']:.0f}s old)")
+            return draft["text"], draft.get("nonce") or new_nonce()
+
+        logger.warning(f"⚠️ Draft buffer empty for prompt {index}, generating inline")
+        logger.info(f"Using prompt: {self.prompts[index][:100]}...")
+        # Fresh text every time: a cached answer would repeat an earlier post, which the journal then skips
+        generated_text = generate_post_from_prompt(self.prompts[index], use_cache=False)
+        if generated_text:
+            fitted = fit_draft(generated_text, "twitter")
+            if not fitted.truncated:
+                generated_text = fitted.text  # trimmed locally, like the prefetched drafts
+        return generated_text, new_nonce()
+
+    def wait_for_refill(self):
+        """Waits for the refill started by the last next_draft(), so its drafts are saved before exit"""
+        if self._refill_thread is not None:
+            self._refill_thread.join()
 
     def run_bot_task(self):
-        """Execute the main bot functionality"""
+        """Execute the main bot functionality: draft -> validate -> publish, without any GUI"""
+        timings = {}
+        start = time.perf_counter()
         try:
             logger.info("Starting scheduled bot task...")
-            App().mainloop()
-            # Get the current prompt and rotate to next one
-            current_prompt = self.prompts[self.current_prompt_index]
-            self.current_prompt_index = (self.current_prompt_index + 1) % len(self.prompts)
-            
-            logger.info(f"Using prompt: {current_prompt[:100]}...")
-            
-            # Generate content using AI
-            generated_text = generate_post_from_prompt(current_prompt)
-            
-            if generated_text:
-                logger.info(f"Generated content: {generated_text}")
-                
-                # Post to both platforms
-                # success_twitter = post_tweet(generated_text)
-                # success_reddit = post_reddit(generated_text)
-                
-                # if success_twitter and success_reddit:
-                #     logger.info("✅ Successfully posted to both Twitter and Reddit")
-                # elif success_twitter:
-                #     logger.warning("⚠️ Posted to Twitter but failed on Reddit")
-                # elif success_reddit:
-                #     logger.warning("⚠️ Posted to Reddit but failed on Twitter")
-                # else:
-                #     logger.error("❌ Failed to post to both platforms")
-                    
-            else:
+
+            # Finish whatever an earlier run left half-published first
+            for key, results in resume_incomplete().items():
+                logger.info(f"♻️ Resumed unfinished post {key}: " + ", ".join(r.summary() for r in results.values()))
+
+            stage = time.perf_counter()
+            generated_text, nonce = self.next_draft()
+            timings["draft"] = time.perf_counter() - stage
+
+            if not generated_text:
                 logger.error("❌ Failed to generate content with AI")
-                
+                return
+            logger.info(f"Generated content: {generated_text}")
+
+            if not is_postable(generated_text):
+                logger.error("❌ Draft is empty or too long to post, skipping this run")
+                return
+
+            stage = time.perf_counter()
+            key, results = publish(drafts_for({}, generated_text), nonce=nonce)
+            timings["publish"] = time.perf_counter() - stage
+
+            for result in results.values():
+                logger.info(f"🧾 Post {key} {result.summary()}")
+            posted, earlier, failed = split_results(results)
+            if earlier:
+                logger.warning(f"⚠️ Not posted again to {', '.join(earlier)}: this draft already went out earlier")
+            if not posted and not failed:
+                logger.warning("⚠️ Nothing new was posted this run")
+            elif not failed:
+                logger.info(f"✅ Successfully posted to {', '.join(posted)}")
+            elif posted:
+                logger.warning(f"⚠️ Posted to {', '.join(posted)} but failed on {', '.join(failed)}")
+            else:
+                logger.error(f"❌ Failed to post to {', '.join(failed)}")
+
         except Exception as e:
             logger.error(f"❌ Error in scheduled task: {str(e)}")
+        finally:
+            timings["total"] = time.perf_counter() - start
+            self.job_timings.append(timings)
+            logger.info("⏱️ Job took " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+            self.log_buffer_stats()
+            self.log_queue_stats()
+
+    def job_stats(self):
+        """p50 / max seconds per stage over the recent jobs"""
+        stats = {}
+        for stage in ("draft", "publish", "total"):
+            values = sorted(t[stage] for t in self.job_timings if stage in t)
+            if values:
+                stats[stage] = {"jobs": len(values), "p50_s": values[len(values) // 2], "max_s": values[-1]}
+        return stats
+
+    def refill_drafts(self):
+        """Tops up the draft buffer; runs as its own job between posts"""
+        try:
+            added = self.prefetcher.refill_once()
+            if added:
+                logger.info(f"Prefetched {added} draft(s)")
+        except Exception as e:
+            logger.error(f"❌ Error refilling draft buffer: {str(e)}")
+
+    def buffer_stats(self):
+        """Queue depth and oldest draft age (seconds) per prompt, for monitoring"""
+        return self.draft_buffer.stats()
+
+    def log_buffer_stats(self):
+        for key, stats in sorted(self.buffer_stats().items()):
+            logger.info(f"📦 Draft buffer {key}: depth={stats['depth']}, oldest={stats['oldest_age_s']}s")
+
+    def log_queue_stats(self):
+        """Posts still waiting in the publish queue, e.g. for the X quota to reset"""
+        for endpoint, backlog in sorted(get_default_queue().drain_estimate()["endpoints"].items()):
+            logger.info(f"📮 Publish queue {endpoint}: {backlog['pending']} pending, drains in ~{backlog['seconds']:.0f}s")
+
+    def add_prefetch_schedule(self, minutes=DEFAULT_REFILL_MINUTES):
+        """Keep the draft buffer full; the first run starts immediately"""
+        self.scheduler.add_job(
+            func=self.refill_drafts,
+            trigger=IntervalTrigger(minutes=minutes),
+            id='draft_prefetch',
+            name=f'Refill draft buffer every {minutes} minutes',
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+        logger.info(f"Added draft prefetch every {minutes} minutes")
 
     def add_daily_schedule(self, hour=10, minute=0):
         """Add a daily scheduled task"""
@@ -151,6 +269,7 @@ class BotScheduler:
         try:
             logger.info("🚀 Starting scheduler...")
             self.list_jobs()
+            self.log_buffer_stats()
             
             # Register shutdown handlers
             atexit.register(lambda: self.scheduler.shutdown())
@@ -172,7 +291,23 @@ class BotScheduler:
 
 def main():
     """Main function to set up and start the scheduler"""
-    bot_scheduler = BotScheduler()
+    parser = argparse.ArgumentParser(description="Run the bot's posting schedule.")
+    parser.add_argument("--gui", action="store_true", help="also open the editor window (needs a display)")
+    parser.add_argument("--once", action="store_true", help="run one post job now and exit")
+    args = parser.parse_args()
+
+    bot_scheduler = BotScheduler(background=args.gui)
+    logger.info(f"⏱️ Startup took {time.perf_counter() - _STARTED:.2f}s")
+
+    if args.once:
+        bot_scheduler.run_bot_task()
+        logger.info(f"⏱️ Job stats: {bot_scheduler.job_stats()}")
+        # The refill thread is a daemon; without this the exit would throw its drafts away
+        bot_scheduler.wait_for_refill()
+        return
+
+    # Keep pre-generated drafts ready so posts go out on time
+    bot_scheduler.add_prefetch_schedule()
     
     # Add different scheduling options (you can customize these)
     
@@ -186,7 +321,14 @@ def main():
     # bot_scheduler.add_weekly_schedule(day_of_week='mon,wed,fri', hour=14, minute=30)
     
     # Start the scheduler
-    bot_scheduler.start()
+    if args.gui:
+        from app import App  # the GUI is an optional front end; the jobs never need it
+
+        bot_scheduler.start()  # returns right away for a background scheduler
+        App().mainloop()
+        bot_scheduler.scheduler.shutdown(wait=False)
+    else:
+        bot_scheduler.start()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,261 @@
+# scraper/dedupe.py
+"""
+Near-duplicate story clustering with MinHash-LSH.
+
+Outlets rewrite summaries completely but keep headlines close, so an entry is
+fingerprinted by the content words of its title (its summary when it has
+none): lowercased, without stopwords and newsroom filler ("report", "says"),
+with plurals and common headline verbs folded ("unveils" -> "launch"). The
+word set is summarized by a MinHash signature; signatures are cut into bands
+and only entries sharing a band bucket become candidates, so clustering stays
+close to linear in the number of entries. Candidates are then checked
+exactly: their word sets must reach `threshold` Jaccard similarity, and their
+key tokens must agree. The numbers must be the same ("Llama 3" is not "Llama 4")
+and the named entities of one must be among those of the other ("Nvidia" is
+not "AMD"). Only the best-ranked entry of each group is kept.
+
+The threshold was calibrated on the headline pairs in tests/test_dedupe.py:
+rewordings of one story score 0.8 and up, while different stories about the
+same company or product differ in a key token or score 0.75 and below
+("OpenAI launches GPT-5" vs "OpenAI delays GPT-5 launch").
+"""
+
+import hashlib
+import random
+import re
+from collections import defaultdict
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python signatures, fine for a few thousand entries
+    np = None
+
+NUM_HASHES = 64
+ROWS_PER_BAND = 4  # 16 bands of 4 rows: pairs at 0.8 similarity become candidates 99.98% of the time
+DEFAULT_THRESHOLD = 0.8
+SIGNATURE_CHUNK = 4096  # entries hashed per numpy batch, bounds peak memory
+
+_MASK64 = (1 << 64) - 1
+_TOKEN = re.compile(r"[A-Za-z0-9]+(?:[.,\-][A-Za-z0-9]+)*(?:['’]s)?")
+_NUMBER = re.compile(r"(\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)(b|bn|m|mn|k|t|tn)?", re.IGNORECASE)
+_UNITS = {"b": "billion", "bn": "billion", "m": "million", "mn": "million", "k": "thousand",
+          "t": "trillion", "tn": "trillion"}
+
+STOPWORDS = frozenset("""
+a an the and or but of in on at to for with by from as is are was were be been its it this that
+these those new after over into about than up out how why what who now just yet here more most
+report reports reported reportedly say says said source sources exclusive breaking update updated
+ai
+""".split())  # "ai" is in nearly every headline of these feeds
+
+# Headline verbs that outlets use interchangeably for the same event.
+SYNONYMS = {
+    **dict.fromkeys(("launch", "launched", "launching", "release", "released", "releasing", "unveil",
+                     "unveiled", "unveiling", "debut", "debuted", "introduce", "introduced",
+                     "announce", "announced", "rolls", "roll"), "launch"),
+    **dict.fromkeys(("acquire", "acquired", "acquiring", "acquisition", "buy", "buying", "bought"), "acquire"),
+    **dict.fromkeys(("raise", "raised", "raising", "funding"), "raise"),
+}
+
+# Multiply-shift hash family: h_i(x) = ((a_i * x + b_i) mod 2^64) >> 32, a_i odd.
+_rng = random.Random(20240601)
+_A = [_rng.getrandbits(64) | 1 for _ in range(NUM_HASHES)]
+_B = [_rng.getrandbits(64) for _ in range(NUM_HASHES)]
+
+
+def _fold(word):
+    """Crude plural / third-person folding: "chips" -> "chip", "launches" -> "launch"."""
+    if len(word) > 4 and word.endswith(("ches", "shes", "sses", "xes")):
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    return SYNONYMS.get(word, word)
+
+
+def _fingerprint(entry):
+    """(content words, numbers, named entities) of an entry's headline."""
+    text = entry.get("title") or entry.get("summary") or ""
+    raw = [t[:-2] if t.endswith(("'s", "’s")) else t for t in _TOKEN.findall(text)]
+    # In Title Case every word is capitalized, so capitals only mark names in sentence case.
+    long_words = [t for t in raw[1:] if t.isalpha() and len(t) > 3]
+    title_case = bool(long_words) and sum(t[0].isupper() for t in long_words) >= 0.7 * len(long_words)
+
+    words, numbers, entities = set(), set(), set()
+    for token in raw:
+        lower = token.lower()
+        number = _NUMBER.fullmatch(lower)
+        if number:
+            value = number.group(1).replace(",", "")
+            numbers.add(value)
+            words.add(value)
+            if number.group(2):
+                words.add(_UNITS[number.group(2)])
+            continue
+        if lower in STOPWORDS:
+            continue
+        if any(c.isdigit() for c in token) or any(c.isupper() for c in token[1:]) \
+                or (token[0].isupper() and not title_case):
+            entities.add(lower)  # "GPT-5", "OpenAI", "AMD", and "Nvidia" in sentence case
+        words.add(_fold(lower))
+    return words, frozenset(numbers), frozenset(entities)
+
+
+def _shingles(entry):
+    return _fingerprint(entry)[0]
+
+
+def _compatible(keys_a, keys_b):
+    """Same numbers, and the entities of one headline are all named in the other."""
+    (numbers_a, entities_a), (numbers_b, entities_b) = keys_a, keys_b
+    return numbers_a == numbers_b and (entities_a <= entities_b or entities_b <= entities_a)
+
+
+def similarity(entry_a, entry_b):
+    """Jaccard similarity of two entries' headline words, or 0.0 if their key tokens disagree."""
+    words_a, *keys_a = _fingerprint(entry_a)
+    words_b, *keys_b = _fingerprint(entry_b)
+    if not words_a or not words_b or not _compatible(keys_a, keys_b):
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def _token_hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def _signatures_python(token_sets):
+    signatures = []
+    for tokens in token_sets:
+        hashes = [_token_hash(t) for t in tokens]
+        signatures.append(tuple(
+            min(((a * h + b) & _MASK64) >> 32 for h in hashes)
+            for a, b in zip(_A, _B)
+        ))
+    return signatures
+
+
+def _signatures_numpy(token_sets):
+    a = np.array(_A, dtype=np.uint64)
+    b = np.array(_B, dtype=np.uint64)
+    # Headlines share most of their words, so each distinct one is hashed once.
+    vocabulary = {}
+    chunks = []
+    for start in range(0, len(token_sets), SIGNATURE_CHUNK):
+        chunk = token_sets[start:start + SIGNATURE_CHUNK]
+        lengths = np.fromiter((len(tokens) for tokens in chunk), dtype=np.int64, count=len(chunk))
+        hashes = np.fromiter(
+            (vocabulary[t] if t in vocabulary else vocabulary.setdefault(t, _token_hash(t))
+             for tokens in chunk for t in tokens),
+            dtype=np.uint64,
+            count=int(lengths.sum()),
+        )
+        # One row per token, one column per hash function; uint64 arithmetic wraps mod 2^64.
+        permuted = (hashes[:, None] * a + b) >> np.uint64(32)
+        # Tokens of one entry are contiguous, so per-entry minimums are a single reduceat.
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        chunks.append(np.minimum.reduceat(permuted, starts, axis=0))
+    return np.concatenate(chunks)
+
+
+def minhash_signatures(entries):
+    """
+    Returns one NUM_HASHES-long signature per entry (a numpy matrix when numpy
+    is installed, otherwise a list of tuples). Entries without any words are
+    not handled here; see cluster_entries().
+    """
+    return _signatures([_shingles(entry) for entry in entries])
+
+
+def _signatures(token_sets):
+    if np is not None:
+        return _signatures_numpy(token_sets)
+    return _signatures_python(token_sets)
+
+
+def _similar_members(token_sets, keys, i, others, threshold):
+    """The members of `others` whose exact similarity to entry `i` is >= `threshold`, with agreeing key tokens."""
+    words = token_sets[i]
+    return [j for j in others
+            if _compatible(keys[i], keys[j])
+            and len(words & token_sets[j]) >= threshold * len(words | token_sets[j]) - 1e-9]
+
+
+def _band_buckets(signatures, band_start):
+    """Index lists of the entries that share the same rows in one band (only groups of 2+)."""
+    band_end = band_start + ROWS_PER_BAND
+    if np is not None:
+        rows = np.ascontiguousarray(signatures[:, band_start:band_end])
+        keys = rows.view(np.dtype((np.void, rows.itemsize * ROWS_PER_BAND))).ravel()
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        shared = np.flatnonzero(counts[inverse] > 1)
+        if not len(shared):
+            return []
+        shared = shared[np.argsort(inverse[shared], kind="stable")]
+        boundaries = np.flatnonzero(np.diff(inverse[shared])) + 1
+        return [group.tolist() for group in np.split(shared, boundaries)]
+
+    buckets = defaultdict(list)
+    for i, signature in enumerate(signatures):
+        buckets[signature[band_start:band_end]].append(i)
+    return [members for members in buckets.values() if len(members) > 1]
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster_indices(signatures, token_sets, keys, threshold=DEFAULT_THRESHOLD):
+    """
+    Groups the indices of entries whose word sets (`token_sets`) reach
+    `threshold` Jaccard similarity and whose (numbers, entities) `keys` agree.
+    `signatures` only pick the candidate pairs.
+    """
+    count = len(signatures)
+    parent = list(range(count))
+    for band_start in range(0, NUM_HASHES, ROWS_PER_BAND):
+        for members in _band_buckets(signatures, band_start):
+            for pos in range(len(members) - 1):
+                i = members[pos]
+                # Pairs already joined through an earlier band need no second look.
+                root_i = _find(parent, i)
+                others = [j for j in members[pos + 1:] if _find(parent, j) != root_i]
+                if not others:
+                    continue
+                for j in _similar_members(token_sets, keys, i, others, threshold):
+                    root_i, root_j = _find(parent, i), _find(parent, j)
+                    if root_i != root_j:
+                        parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters = defaultdict(list)
+    for i in range(count):
+        clusters[_find(parent, i)].append(i)
+    return list(clusters.values())
+
+
+def cluster_entries(entries, threshold=DEFAULT_THRESHOLD):
+    """
+    Keeps one entry per near-duplicate cluster: the first one, since entries
+    arrive ranked. The URLs of the dropped copies are listed under "duplicates".
+    """
+    fingerprints = [_fingerprint(entry) for entry in entries]
+    worded = [i for i, (words, _, _) in enumerate(fingerprints) if words]
+    if len(worded) < 2:
+        return list(entries)
+
+    token_sets = [fingerprints[i][0] for i in worded]
+    keys = [fingerprints[i][1:] for i in worded]
+    signatures = _signatures(token_sets)
+    clusters = [[worded[i] for i in members] for members in cluster_indices(signatures, token_sets, keys, threshold)]
+    clustered = set(worded)
+    clusters += [[i] for i in range(len(entries)) if i not in clustered]
+
+    representatives = []
+    for members in sorted(clusters, key=lambda m: m[0]):
+        entry = dict(entries[members[0]])
+        if len(members) > 1:
+            entry["duplicates"] = [entries[i]["url"] for i in members[1:]]
+        representatives.append(entry)
+    return representatives
@@ -0,0 +1,255 @@
+# scraper/enrich.py
+"""
+Article enrichment: downloads article pages, extracts the main text and builds a
+short extractive summary locally (no LLM call). Results are cached by a hash of
+the extracted text, so re-selecting an article, or the same story under another
+URL, is instant.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from env_config import CACHE_DIR
+from scraper.techcrunch import fetch_page, get_backend
+
+DEFAULT_ARTICLE_CACHE_DIR = CACHE_DIR / "articles"
+ARTICLE_MAX_AGE = 24 * 3600  # re-download pages older than this; unchanged text is not re-summarized
+ARTICLE_RETENTION = 7 * 24 * 3600  # URLs not fetched again within this are evicted
+MAX_CACHED_ARTICLES = 2000  # URLs kept in the index; the least recently fetched go first
+INDEX_COMPACT_SLACK = 500  # superseded index lines tolerated before the index is rewritten
+MAX_ENRICH_WORKERS = 8
+SUMMARY_SENTENCES = 3
+MIN_PARAGRAPH_CHARS = 40
+
+# Tried in order; the first one that yields enough paragraph text wins.
+BODY_SELECTORS = ("article p", "main p", "[itemprop=articleBody] p", "p")
+
+STOPWORDS = set("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had
+has have having he her here hers him his how i if in into is it its itself just me more most my
+no nor not now of off on once only or other our out over own said same she should so some such
+than that the their them then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your
+""".split())
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'“])")
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def extract_main_text(html, backend=None):
+    backend = backend or get_backend()
+    root = backend.parse(html)
+    for selector in BODY_SELECTORS:
+        paragraphs = [backend.text(node) for node in backend.select(root, selector)]
+        paragraphs = [p for p in paragraphs if len(p) >= MIN_PARAGRAPH_CHARS]
+        if sum(len(p) for p in paragraphs) >= 200:
+            return "\n\n".join(paragraphs)
+    return ""
+
+
+def summarize(text, max_sentences=SUMMARY_SENTENCES):
+    """
+    Picks the sentences with the highest average word frequency and returns them
+    in their original order.
+    """
+    # dict.fromkeys drops repeated sentences (boilerplate, pull quotes) but keeps order.
+    sentences = list(dict.fromkeys(s.strip() for s in _SENTENCE_SPLIT.split(text.replace("\n", " ")) if s.strip()))
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences)
+
+    freq = Counter(w for w in _WORD.findall(text.lower()) if w not in STOPWORDS)
+    if not freq:
+        return " ".join(sentences[:max_sentences])
+    top = max(freq.values())
+
+    def score(index):
+        words = [w for w in _WORD.findall(sentences[index].lower()) if w not in STOPWORDS]
+        if not words:
+            return 0.0
+        # Small boost for the lead, which usually carries the news.
+        lead_bonus = 0.2 if index == 0 else 0.0
+        return sum(freq[w] for w in words) / (top * len(words)) + lead_bonus
+
+    best = sorted(sorted(range(len(sentences)), key=score, reverse=True)[:max_sentences])
+    return " ".join(sentences[i] for i in best)
+
+
+class ArticleCache:
+    """
+    Two-level store under `directory`: index.jsonl maps URL -> content hash, and
+    blobs/<hash>.json holds the text and summary for that content. The hash
+    is taken over the extracted text, so pages that differ only in markup
+    (ads, timestamps, tracking ids) share one blob.
+
+    Index updates are appended; compact() rewrites the index and evicts URLs
+    not fetched within `retention`, then the least recently fetched ones
+    beyond `max_entries`, along with the blobs nothing points to any more.
+    """
+
+    def __init__(self, directory=DEFAULT_ARTICLE_CACHE_DIR, max_age=ARTICLE_MAX_AGE,
+                 retention=ARTICLE_RETENTION, max_entries=MAX_CACHED_ARTICLES):
+        self.directory = Path(directory)
+        self.blob_dir = self.directory / "blobs"
+        self.index_path = self.directory / "index.jsonl"
+        self.max_age = max_age
+        self.retention = retention
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._blobs = {}
+        self._index = {}
+        self._lines = 0
+        self._index_file = None
+        damaged = self._load_index()
+        cutoff = time.time() - retention
+        if damaged or self._needs_compaction() or any(e["fetched_at"] < cutoff for e in self._index.values()):
+            self.compact()
+
+    def _load_index(self):
+        """Replays index.jsonl; returns True if it had damaged lines (e.g. cut short by a crash)."""
+        damaged = False
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self._index[record["url"]] = {"hash": record["hash"], "fetched_at": record["fetched_at"]}
+                    except (ValueError, KeyError, TypeError):
+                        damaged = True
+                        continue
+                    self._lines += 1
+        except OSError:
+            pass
+        return damaged
+
+    def _needs_compaction(self):
+        return self._lines > 2 * len(self._index) + INDEX_COMPACT_SLACK or len(self._index) > self.max_entries
+
+    def _write_json(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _load_blob(self, content_hash):
+        if content_hash not in self._blobs:
+            try:
+                with open(self.blob_dir / f"{content_hash}.json", encoding="utf-8") as f:
+                    self._blobs[content_hash] = json.load(f)
+            except (OSError, ValueError):
+                return None
+        return self._blobs[content_hash]
+
+    def get(self, url, allow_stale=False):
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is None or (not allow_stale and time.time() - entry["fetched_at"] > self.max_age):
+                return None
+            return self._load_blob(entry["hash"])
+
+    def get_by_hash(self, content_hash):
+        with self._lock:
+            return self._load_blob(content_hash)
+
+    def put(self, url, content_hash, extracted):
+        with self._lock:
+            if self._load_blob(content_hash) is None:
+                self._write_json(self.blob_dir / f"{content_hash}.json", extracted)
+                self._blobs[content_hash] = extracted
+            record = {"url": url, "hash": content_hash, "fetched_at": time.time()}
+            self._index[url] = {"hash": content_hash, "fetched_at": record["fetched_at"]}
+            if self._index_file is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._index_file = open(self.index_path, "a", encoding="utf-8")
+            self._index_file.write(json.dumps(record) + "\n")
+            self._index_file.flush()
+            self._lines += 1
+            compact = self._needs_compaction()
+        if compact:
+            self.compact()
+
+    def compact(self):
+        """Rewrites the index without evicted URLs and deletes unreferenced blobs. Returns the URLs evicted."""
+        with self._lock:
+            cutoff = time.time() - self.retention
+            live = sorted(((url, entry) for url, entry in self._index.items() if entry["fetched_at"] >= cutoff),
+                          key=lambda item: item[1]["fetched_at"], reverse=True)[:self.max_entries]
+            evicted = len(self._index) - len(live)
+            self._index = dict(live)
+            if self._index_file is not None:
+                self._index_file.close()
+                self._index_file = None
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for url, entry in self._index.items():
+                    f.write(json.dumps({"url": url, **entry}) + "\n")
+            os.replace(tmp_path, self.index_path)
+            (self.directory / "index.json").unlink(missing_ok=True)  # the older, rewritten-per-put index
+            self._lines = len(self._index)
+
+            referenced = {entry["hash"] for entry in self._index.values()}
+            self._blobs = {h: blob for h, blob in self._blobs.items() if h in referenced}
+            for blob in self.blob_dir.glob("*.json"):
+                if blob.stem not in referenced:
+                    blob.unlink(missing_ok=True)
+        return evicted
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_article_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ArticleCache()
+        return _default_cache
+
+
+def enrich_article(article, cache=None):
+    """
+    Returns a copy of an article dict with `text` and `summary` filled in. The
+    article itself, usually the fetcher's, is left as it is.
+    """
+    if article.get("summary"):
+        return dict(article)
+    cache = cache or get_default_article_cache()
+    extracted = cache.get(article["url"])
+    if extracted is None:
+        text = extract_main_text(fetch_page(article["url"]))
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        extracted = cache.get_by_hash(content_hash)
+        if extracted is None:
+            extracted = {"text": text, "summary": summarize(text)}
+        cache.put(article["url"], content_hash, extracted)
+    return {**article, "text": extracted["text"], "summary": extracted["summary"]}
+
+
+def enrich_articles(articles, max_workers=MAX_ENRICH_WORKERS, cache=None):
+    """
+    Enriches several articles concurrently and returns the enriched copies, in
+    order. Pages that fail to download come back as they were instead of
+    failing the batch.
+    """
+    def enrich_one(article):
+        try:
+            return enrich_article(article, cache)
+        except Exception as e:
+            print(f"🔴 Could not enrich {article.get('url')}: {e}")
+            return article
+
+    if not articles:
+        return articles
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(articles))) as executor:
+        return list(executor.map(enrich_one, articles))
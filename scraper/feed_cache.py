@@ -0,0 +1,132 @@
+# scraper/feed_cache.py
+"""
+Persistent cache of parsed feeds plus the HTTP validators (ETag / Last-Modified)
+needed to poll them with conditional GETs. Entries are copied in and out, so
+callers may change what they get without touching the cache.
+"""
+
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from env_config import CACHE_DIR
+
+DEFAULT_CACHE_PATH = CACHE_DIR / "feeds.json"
+DEFAULT_TTL = 7 * 24 * 3600  # drop feeds that have not been polled for a week
+DEFAULT_MAX_FEEDS = 200
+
+
+class FeedCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_feeds=DEFAULT_MAX_FEEDS):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_feeds = max_feeds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._feeds = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._feeds, f)
+        os.replace(tmp_path, self.path)
+
+    def _evict(self, now):
+        expired = [url for url, item in self._feeds.items() if now - item["used_at"] > self.ttl]
+        for url in expired:
+            del self._feeds[url]
+        overflow = len(self._feeds) - self.max_feeds
+        if overflow > 0:
+            # Least recently polled feeds go first.
+            for url in sorted(self._feeds, key=lambda u: self._feeds[u]["used_at"])[:overflow]:
+                del self._feeds[url]
+
+    def get(self, url):
+        """Returns the cached item for `url` (validators + entries) or None."""
+        with self._lock:
+            item = self._feeds.get(url)
+            if item is None or time.time() - item["used_at"] > self.ttl:
+                return None
+            return copy.deepcopy(item)
+
+    def conditional_headers(self, url, min_entries=0):
+        """
+        Headers that turn a plain GET of `url` into a conditional one. Nothing is
+        returned when the cached copy was cut short and holds fewer than
+        `min_entries` entries, since a 304 could not be answered from it.
+        """
+        item = self.get(url)
+        headers = {}
+        if item and (item.get("complete", True) or len(item["entries"]) >= min_entries):
+            if item.get("etag"):
+                headers["If-None-Match"] = item["etag"]
+            if item.get("last_modified"):
+                headers["If-Modified-Since"] = item["last_modified"]
+        return headers
+
+    def record_hit(self, url):
+        """Marks a 304 for `url` and returns its cached entries (None if evicted meanwhile)."""
+        with self._lock:
+            item = self._feeds.get(url)
+            if item is None:
+                return None
+            # Not written to disk here, so a 304 costs no file I/O; the new
+            # timestamp is persisted with the next store().
+            item["used_at"] = time.time()
+            self.hits += 1
+            return copy.deepcopy(item["entries"])
+
+    def store(self, url, entries, etag=None, last_modified=None, complete=True):
+        """`complete` is False when only the first entries of the feed were parsed."""
+        with self._lock:
+            now = time.time()
+            self._feeds[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "entries": copy.deepcopy(entries),
+                "complete": complete,
+                "used_at": now,
+            }
+            self.misses += 1
+            self._evict(now)
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._feeds = {}
+            self._save()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "feeds": len(self._feeds),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = FeedCache()
+        return _default_cache
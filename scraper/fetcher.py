@@ -1,12 +1,210 @@
 # scraper/rss_fetcher.py
+import calendar
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
 import feedparser
+import requests
+
+from scraper.dedupe import cluster_entries
+from scraper.feed_cache import get_default_cache
+from scraper.http_pool import get_session
+from scraper.seen_index import FETCHED, POSTED, get_default_index
+from scraper.stream_parser import iter_feed_entries
+
+FEED_TIMEOUT = 10  # seconds allowed for each feed, connect + read
+MAX_FEED_WORKERS = 8
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# Sources pulled on every cycle by fetch_ai_news()
+AI_FEEDS = [
+    "https://techcrunch.com/category/artificial-intelligence/feed/",
+    "https://www.theverge.com/rss/ai-artificial-intelligence/index.xml",
+    "https://venturebeat.com/category/ai/feed/",
+    "https://www.technologyreview.com/topic/artificial-intelligence/feed",
+    "https://www.wired.com/feed/tag/ai/latest/rss",
+]
+
+
+@dataclass
+class FeedSetResult:
+    """Merged entries of a feed set plus the feeds that failed or timed out."""
+    entries: list = field(default_factory=list)
+    errors: dict = field(default_factory=dict)  # feed url -> error message
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def _entry_timestamp(entry):
+    parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+    return calendar.timegm(parsed) if parsed else None
+
+
+def _normalize_entry(entry, source):
+    return {
+        "title": entry.get("title", "").strip(),
+        "url": entry.get("link", ""),
+        "published": _entry_timestamp(entry),
+        "source": source,
+    }
+
+
+def _open_feed(url, timeout, cache, limit):
+    """
+    Sends a (conditional, when cached) streaming GET for `url`.
+    Returns (cached_entries, None) on a usable 304, otherwise (None, response).
+    """
+    headers = {}
+    if cache:
+        headers.update(cache.conditional_headers(url, min_entries=limit))
+
+    session = get_session()
+    resp = session.get(url, timeout=timeout, headers=headers, stream=True)
+    if resp.status_code == 304 and cache:
+        resp.close()
+        entries = cache.record_hit(url)
+        if entries is not None:
+            return entries, None
+        # Evicted between the request and the reply, so fetch it in full.
+        resp = session.get(url, timeout=timeout, stream=True)
+    try:
+        resp.raise_for_status()
+    except requests.HTTPError:
+        resp.close()
+        raise
+    return None, resp
+
+
+def iter_rss_feed(url, limit=10, timeout=FEED_TIMEOUT, cache=None, use_cache=True):
+    """
+    Yields up to `limit` entries of a feed while it downloads. Once `limit`
+    entries are out the connection is closed, so the rest of a large feed is
+    never read or parsed. Malformed feeds fall back to feedparser over the
+    whole document.
+    """
+    cache = (cache or get_default_cache()) if use_cache else None
+    cached, resp = _open_feed(url, timeout, cache, limit)
+    if cached is not None:
+        yield from cached[:limit]
+        return
+
+    entries, received, complete = [], [], False
+    raw_chunks = resp.iter_content(STREAM_CHUNK_SIZE)
+
+    def chunks():
+        for chunk in raw_chunks:
+            received.append(chunk)
+            yield chunk
+
+    try:
+        try:
+            for entry in iter_feed_entries(chunks(), url):
+                entries.append(entry)
+                yield entry
+                if len(entries) >= limit:
+                    break
+            else:
+                complete = True
+        except ET.ParseError:
+            body = b"".join(received) + b"".join(raw_chunks)
+            already_sent = {entry["url"] for entry in entries}
+            entries = [_normalize_entry(entry, url) for entry in feedparser.parse(body).entries if entry.get("link")]
+            complete = True
+            yield from [entry for entry in entries[:limit] if entry["url"] not in already_sent]
+    finally:
+        resp.close()
+        if cache and entries:
+            cache.store(url, entries, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), complete)
+
+
+def fetch_rss_feed(url, limit=10, timeout=FEED_TIMEOUT, cache=None, use_cache=True, streaming=True):
+    """
+    Fetches and parses one feed. With the cache enabled the request is sent as a
+    conditional GET and a 304 returns the previously parsed entries without
+    downloading or parsing anything. `streaming=False` parses the whole
+    document with feedparser instead of stopping after `limit` entries.
+    """
+    if streaming:
+        return list(iter_rss_feed(url, limit, timeout, cache, use_cache))
+
+    cache = (cache or get_default_cache()) if use_cache else None
+    cached, resp = _open_feed(url, timeout, cache, limit)
+    if cached is not None:
+        return cached[:limit]
+    with resp:
+        feed = feedparser.parse(resp.content)
+    entries = [_normalize_entry(entry, url) for entry in feed.entries if entry.get("link")]
+    if cache:
+        cache.store(url, entries, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+    return entries[:limit]
+
+
+def _rank_entries(per_feed):
+    """
+    Merges the entries of several feeds into one list, newest first.
+    Entries without a date keep their in-feed position and go after dated ones;
+    duplicate URLs are kept once.
+    """
+    merged, seen = [], set()
+    for feed_entries in per_feed:
+        for position, entry in enumerate(feed_entries):
+            if entry["url"] in seen:
+                continue
+            seen.add(entry["url"])
+            merged.append((position, entry))
+    merged.sort(key=lambda item: (item[1]["published"] is None, -(item[1]["published"] or 0), item[0]))
+    return [entry for _, entry in merged]
+
+
+def fetch_feed_set(urls, limit=10, timeout=FEED_TIMEOUT, max_workers=MAX_FEED_WORKERS,
+                   exclude_stage=None, seen_index=None, dedupe=False):
+    """
+    Fetches several feeds concurrently and merges them into one ranked list.
+    Feeds that fail or take longer than `timeout` are reported in `errors`
+    instead of failing the whole set, so a cycle takes as long as the slowest
+    feed (capped at `timeout`) rather than the sum of all of them.
+    With `exclude_stage` set (e.g. seen_index.POSTED), articles that already
+    reached that stage are left out, and the returned ones are marked fetched.
+    With `dedupe`, the same story reported by several outlets under slightly
+    different headlines is kept once (scraper.dedupe).
+    """
+    result = FeedSetResult()
+    if not urls:
+        return result
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(urls)))
+    futures = {executor.submit(fetch_rss_feed, url, limit, timeout): url for url in urls}
+    try:
+        # requests' timeout is per socket operation, so also bound the whole set.
+        done, not_done = wait(futures, timeout=timeout)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    per_feed = {}
+    for future in done:
+        url = futures[future]
+        try:
+            per_feed[url] = future.result()
+        except Exception as e:
+            result.errors[url] = str(e)
+    for future in not_done:
+        result.errors[futures[future]] = f"timed out after {timeout}s"
+
+    # Keep the caller's feed order so ties are ranked deterministically.
+    result.entries = _rank_entries(per_feed[url] for url in urls if url in per_feed)
+    if dedupe:
+        result.entries = cluster_entries(result.entries)
+    if exclude_stage:
+        index = seen_index or get_default_index()
+        result.entries = index.filter_unseen(result.entries, exclude_stage)
+        index.mark([entry["url"] for entry in result.entries], FETCHED)
+    for url, error in result.errors.items():
+        print(f"🔴 Feed failed: {url} ({error})")
+    return result
 
-def fetch_rss_feed(url, limit=10):
-    feed = feedparser.parse(url)
-    return [
-        {"title": entry.title, "url": entry.link}
-        for entry in feed.entries[:limit]
-    ]
 
 def fetch_techcrunch_ai():
     return fetch_rss_feed(
@@ -14,3 +212,10 @@ def fetch_techcrunch_ai():
     )
 
 
+def fetch_ai_news(limit=10, exclude_stage=POSTED, dedupe=True):
+    """
+    Pulls every feed in AI_FEEDS concurrently and returns the merged, ranked
+    entries, minus the articles that already reached `exclude_stage`.
+    `dedupe` keeps one entry per story reported by several outlets.
+    """
+    return fetch_feed_set(AI_FEEDS, limit=limit, exclude_stage=exclude_stage, dedupe=dedupe).entries
@@ -0,0 +1,41 @@
+# scraper/http_pool.py
+"""
+Shared keep-alive HTTP session for the scrapers, so repeated requests to the
+same host reuse their TCP/TLS connections instead of opening new ones.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_CONNECTIONS = 16  # distinct hosts kept in the pool
+POOL_MAXSIZE = 16  # open connections per host, at least as many as worker threads
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(DEFAULT_HEADERS)
+            _session = session
+        return _session
+
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
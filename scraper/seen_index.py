@@ -0,0 +1,144 @@
+# scraper/seen_index.py
+"""
+Durable record of the article URLs the bot has already fetched, refined or posted.
+Lookups go through an in-memory Bloom filter first, so the common "never seen"
+answer does not touch SQLite at all.
+"""
+
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urldefrag
+
+from env_config import CACHE_DIR
+
+DEFAULT_INDEX_PATH = CACHE_DIR / "seen.sqlite3"
+DEFAULT_RETENTION_DAYS = 90
+
+FETCHED = "fetched"
+REFINED = "refined"
+POSTED = "posted"
+
+
+class BloomFilter:
+    def __init__(self, capacity=100_000, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def normalize_url(url):
+    return urldefrag(url.strip())[0]
+
+
+class SeenIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH, retention_days=DEFAULT_RETENTION_DAYS, capacity=100_000):
+        self.path = Path(path)
+        self.retention_days = retention_days
+        self.capacity = capacity
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " url TEXT NOT NULL, stage TEXT NOT NULL,"
+            " first_seen REAL NOT NULL, last_seen REAL NOT NULL,"
+            " PRIMARY KEY (url, stage)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS seen_last_seen ON seen (last_seen)")
+        self._db.commit()
+        self._rebuild_filter()
+
+    @staticmethod
+    def _key(url, stage):
+        return f"{stage}\0{url}"
+
+    def _rebuild_filter(self):
+        count = self._db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+        self._bloom = BloomFilter(max(self.capacity, count * 2))
+        for url, stage in self._db.execute("SELECT url, stage FROM seen"):
+            self._bloom.add(self._key(url, stage))
+
+    def mark(self, urls, stage=FETCHED):
+        """Records one URL or an iterable of URLs as having reached `stage`."""
+        if isinstance(urls, str):
+            urls = [urls]
+        now = time.time()
+        rows = [(normalize_url(url), stage, now, now) for url in urls if url]
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO seen (url, stage, first_seen, last_seen) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (url, stage) DO UPDATE SET last_seen = excluded.last_seen",
+                rows,
+            )
+            self._db.commit()
+            for url, _, _, _ in rows:
+                self._bloom.add(self._key(url, stage))
+
+    def seen(self, url, stage=FETCHED):
+        url = normalize_url(url)
+        with self._lock:
+            if self._key(url, stage) not in self._bloom:
+                return False
+            row = self._db.execute("SELECT 1 FROM seen WHERE url = ? AND stage = ?", (url, stage)).fetchone()
+            return row is not None
+
+    def filter_unseen(self, entries, stage=POSTED):
+        """Drops the `{"title", "url"}` entries whose URL already reached `stage`."""
+        return [entry for entry in entries if not self.seen(entry["url"], stage)]
+
+    def compact(self, retention_days=None):
+        """
+        Forgets URLs not seen within the retention window and shrinks the file.
+        Returns the number of rows removed.
+        """
+        retention_days = self.retention_days if retention_days is None else retention_days
+        cutoff = time.time() - retention_days * 24 * 3600
+        with self._lock:
+            removed = self._db.execute("DELETE FROM seen WHERE last_seen < ?", (cutoff,)).rowcount
+            self._db.commit()
+            if removed:
+                self._db.execute("VACUUM")
+                # A Bloom filter cannot forget keys, so start a fresh one.
+                self._rebuild_filter()
+            return removed
+
+    def stats(self):
+        with self._lock:
+            rows = self._db.execute("SELECT stage, COUNT(*) FROM seen GROUP BY stage").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_default_index():
+    """Shared index, compacted once when first opened."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = SeenIndex()
+            _default_index.compact()
+        return _default_index
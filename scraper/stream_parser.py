@@ -0,0 +1,93 @@
+# scraper/stream_parser.py
+"""
+Incremental RSS / Atom parser. Entries are produced while the document is still
+arriving, so a caller that only wants the first few can stop reading early.
+"""
+
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+ENTRY_TAGS = {"item", "entry"}  # RSS 0.9x/1.0/2.0 and Atom
+DATE_TAGS = ("pubDate", "published", "date", "updated")
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _parse_date(value):
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _entry_link(children):
+    for child in children:
+        if _local(child.tag) != "link":
+            continue
+        href = child.get("href")
+        if href is not None:
+            if child.get("rel", "alternate") == "alternate":
+                return href.strip()
+        elif child.text and child.text.strip():
+            return child.text.strip()
+    for child in children:
+        if _local(child.tag) == "guid" and child.get("isPermaLink", "true") == "true" and child.text:
+            return child.text.strip()
+    return ""
+
+
+def _normalize(elem, source):
+    children = list(elem)
+    texts = {}
+    for child in children:
+        texts.setdefault(_local(child.tag), "".join(child.itertext()).strip())
+    published = None
+    for tag in DATE_TAGS:
+        published = _parse_date(texts.get(tag))
+        if published is not None:
+            break
+    return {
+        "title": texts.get("title", ""),
+        "url": _entry_link(children),
+        "published": published,
+        "source": source,
+    }
+
+
+def iter_feed_entries(chunks, source=None):
+    """
+    Yields normalized `{"title", "url", "published", "source"}` entries from an
+    iterable of byte chunks. Processed entries are detached from the tree, so
+    memory stays flat however long the feed is. Raises xml.etree.ElementTree.ParseError
+    on malformed input.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                stack.append(elem)
+                continue
+            stack.pop()
+            if _local(elem.tag) not in ENTRY_TAGS:
+                continue
+            entry = _normalize(elem, source)
+            if stack:
+                stack[-1].remove(elem)
+            elem.clear()
+            if entry["url"]:
+                yield entry
+    parser.close()
@@ -1,44 +1,229 @@
-# import requests
-# from bs4 import BeautifulSoup
-
-# def fetch_techcrunch_ai():
-#     url = "https://techcrunch.com/tag/artificial-intelligence/feed/"
-#     headers = {'User-Agent': 'Mozilla/5.0'}
-#     resp = requests.get(url)
-#     soup = BeautifulSoup(resp.text, 'html.parser')
-#     articles = []
-#     for article in soup.find_all("a", class_="post-block__title__link", href=True)[0:1]:
-#         title = article.get_text(strip=True)
-#         link = article['href']
-#         if title and link:
-#             articles.append({"title": title, "url": link})
-#     for article in articles:
-#         print(f"Title: {article['title']}")
-#         print(f"URL: {article['url']}")
-#         print("------------------------")
-#     return articles
-
-import requests
-from bs4 import BeautifulSoup
-
-def fetch_techcrunch_ai():
-    url = "https://www.bloomberg.com/technology"
-    headers = {"Accept": "text/html"}
-    resp = requests.get(url, headers=headers)
-    soup = BeautifulSoup(resp.text, 'html.parser')
-    titles = soup.find_all("h3" , class_="SectionFrontHeaderBrand_title__RyJct")
-    print("Found articles on TechCrunch AI.", titles)
-    # articles = []
-    # for article in titles[0:10]:
-    #     title = article.get_text(strip=True)
-    #     articles.append(title)
-    #     print(f"Title: {title}")
-        
-    # return articles
+# scraper/techcrunch.py
+"""
+HTML scraping backend for sites without a usable RSS feed.
 
-if __name__ == "__main__":
+Each site is described by a selector config in SITE_CONFIGS. Pages are
+downloaded over the shared keep-alive session and parsed with the fastest
+installed parser: selectolax, then lxml (with compiled cssselect selectors),
+then BeautifulSoup as the pure-Python fallback. Results have the same shape
+as scraper.fetcher.fetch_rss_feed().
+"""
+
+import sys
+import time
+from functools import lru_cache
+from urllib.parse import urljoin
+
+from scraper.http_pool import get_session
+
+SCRAPE_TIMEOUT = 10
+
+# item:  CSS selector matching one element per article
+# title: selector for the headline inside the item (None = the item's own text)
+# link:  selector for the <a> inside the item (None = the item itself or its enclosing <a>)
+SITE_CONFIGS = {
+    "bloomberg_technology": {
+        "url": "https://www.bloomberg.com/technology",
+        "item": "h3.SectionFrontHeaderBrand_title__RyJct",
+        "title": None,
+        "link": None,
+    },
+    "techcrunch_ai": {
+        "url": "https://techcrunch.com/category/artificial-intelligence/",
+        "item": "h3.loop-card__title",
+        "title": None,
+        "link": "a",
+    },
+}
+
+
+class SelectolaxBackend:
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser = LexborHTMLParser
+
+    def parse(self, html):
+        return self._parser(html)
+
+    def select(self, node, selector):
+        return node.css(selector)
+
+    def select_one(self, node, selector):
+        return node.css_first(selector)
+
+    def text(self, node):
+        return node.text(strip=True)
+
+    def href(self, node):
+        return node.attributes.get("href")
+
+    def enclosing_link(self, node):
+        while node is not None and node.tag != "a":
+            node = node.parent
+        return node
+
+
+class LxmlBackend:
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        from lxml.cssselect import CSSSelector
+        self._fromstring = lxml.html.fromstring
+        # Selectors are compiled to XPath once and reused for every page.
+        self._compile = lru_cache(maxsize=128)(CSSSelector)
+
+    def parse(self, html):
+        return self._fromstring(html)
+
+    def select(self, node, selector):
+        return self._compile(selector)(node)
+
+    def select_one(self, node, selector):
+        found = self.select(node, selector)
+        return found[0] if found else None
+
+    def text(self, node):
+        return " ".join(node.text_content().split())
+
+    def href(self, node):
+        return node.get("href")
+
+    def enclosing_link(self, node):
+        if node.tag == "a":
+            return node
+        return next(node.iterancestors("a"), None)
+
+
+class SoupBackend:
+    name = "beautifulsoup"
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self._soup = BeautifulSoup
+
+    def parse(self, html):
+        return self._soup(html, "html.parser")
+
+    def select(self, node, selector):
+        return node.select(selector)
+
+    def select_one(self, node, selector):
+        return node.select_one(selector)
+
+    def text(self, node):
+        return node.get_text(" ", strip=True)
+
+    def href(self, node):
+        return node.get("href")
+
+    def enclosing_link(self, node):
+        return node if node.name == "a" else node.find_parent("a")
+
+
+BACKENDS = (SelectolaxBackend, LxmlBackend, SoupBackend)
+
+
+def available_backends():
+    found = []
+    for backend_cls in BACKENDS:
+        try:
+            found.append(backend_cls())
+        except ImportError:
+            continue
+    return found
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """The fastest parser backend that is installed."""
+    backends = available_backends()
+    if not backends:
+        raise ImportError("No HTML parser installed; install selectolax, lxml + cssselect or beautifulsoup4.")
+    return backends[0]
+
+
+def parse_articles(html, config, base_url=None, backend=None):
+    backend = backend or get_backend()
+    base_url = base_url or config["url"]
+    root = backend.parse(html)
+    articles, seen = [], set()
+    for item in backend.select(root, config["item"]):
+        title_node = backend.select_one(item, config["title"]) if config.get("title") else item
+        link_node = backend.select_one(item, config["link"]) if config.get("link") else backend.enclosing_link(item)
+        title = backend.text(title_node) if title_node is not None else ""
+        href = backend.href(link_node) if link_node is not None else None
+        if not title or not href:
+            continue
+        url = urljoin(base_url, href)
+        if url in seen:
+            continue
+        seen.add(url)
+        articles.append({"title": title, "url": url, "published": None, "source": base_url})
+    return articles
+
+
+def fetch_page(url, timeout=SCRAPE_TIMEOUT):
+    resp = get_session().get(url, timeout=timeout, headers={"Accept": "text/html"})
+    resp.raise_for_status()
+    return resp.text
+
+
+def scrape_site(site, limit=10, timeout=SCRAPE_TIMEOUT):
+    """Scrapes one site from SITE_CONFIGS and returns its `{"title", "url"}` entries."""
+    config = SITE_CONFIGS[site]
+    return parse_articles(fetch_page(config["url"], timeout), config)[:limit]
+
+
+def fetch_techcrunch_ai(limit=10):
+    articles = scrape_site("bloomberg_technology", limit)
+    print(f"Found {len(articles)} articles.")
+    return articles
+
+
+def _legacy_parse(html):
+    """The previous implementation, kept as the baseline for benchmark_parse()."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    return soup.find_all("h3", class_="SectionFrontHeaderBrand_title__RyJct")
+
+
+def benchmark_parse(html, site="bloomberg_technology", runs=20):
     """
-    Initialize the fetcher module.
+    Times parsing one page with every installed backend against the previous
+    BeautifulSoup/html.parser implementation. Returns milliseconds per page.
     """
-    print("TechCrunch AI fetcher initialized.")
-    fetch_techcrunch_ai()
\ No newline at end of file
+    config = SITE_CONFIGS[site]
+    timings = {}
+    candidates = [("legacy (html.parser)", _legacy_parse)]
+    candidates += [(backend.name, lambda page, b=backend: parse_articles(page, config, backend=b))
+                   for backend in available_backends()]
+    for name, parse in candidates:
+        parse(html)  # warm-up, also compiles the selectors
+        start = time.perf_counter()
+        for _ in range(runs):
+            parse(html)
+        timings[name] = (time.perf_counter() - start) * 1000 / runs
+    return timings
+
+
+if __name__ == "__main__":
+    # python -m scraper.techcrunch                 -> scrape and print
+    # python -m scraper.techcrunch --bench [file]  -> parse-time benchmark
+    if len(sys.argv) > 1 and sys.argv[1] == "--bench":
+        if len(sys.argv) > 2:
+            with open(sys.argv[2], encoding="utf-8") as f:
+                page = f.read()
+        else:
+            page = fetch_page(SITE_CONFIGS["bloomberg_technology"]["url"])
+        print(f"Page size: {len(page) / 1024:.0f} KiB")
+        for name, ms in benchmark_parse(page).items():
+            print(f"  {name:<22} {ms:8.2f} ms/page")
+    else:
+        print("TechCrunch AI fetcher initialized.")
+        for article in fetch_techcrunch_ai():
+            print(f"Title: {article['title']}")
+            print(f"URL: {article['url']}")
+            print("------------------------")
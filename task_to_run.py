@@ -18,9 +18,9 @@ import os
 from pathlib import Path
 
 # Import the main bot functionality
-from twitter_client import post_tweet
-from gemini_client import generate_post_from_prompt
-from reddit_client import post_reddit
+from gemini_client import generate_post_from_prompt, refine_text_for_platforms
+from publish_journal import new_nonce
+from publisher import drafts_for, publish, resume_incomplete, split_results
 
 def log_execution(message, log_file_path="/workspace/task_execution.log"):
     """Log a message with timestamp to the log file"""
@@ -31,10 +31,15 @@ def log_execution(message, log_file_path="/workspace/task_execution.log"):
         print(f"Failed to write to log: {e}")
 
 def run_bot_task():
-    """Execute the main bot task with logging"""
+    """Execute the main bot task with logging; returns the publish results, or None if nothing was generated"""
     log_execution("🚀 Starting scheduled bot task execution")
     
     try:
+        # Finish any post that an earlier run left half-published before starting a new one
+        for key, results in resume_incomplete().items():
+            summary = ", ".join(result.summary() for result in results.values())
+            log_execution(f"♻️ Resumed unfinished post {key} ({summary})")
+
         # Define the prompt (you can modify this or make it dynamic)
         prompt = """
         The tweet should be about the importance of embracing change and constantly learning new skills (both technical and soft skills).
@@ -48,23 +53,35 @@ def run_bot_task():
         
         log_execution(f"📝 Using prompt: {prompt[:100]}...")
 
-        generated_text = generate_post_from_prompt(prompt)
+        # Fresh text every run; the nonce makes it a new post even if Gemini repeats itself
+        generated_text = generate_post_from_prompt(prompt, use_cache=False)
+        nonce = new_nonce()
         
         if generated_text:
             log_execution(f"🤖 Generated content: {generated_text}")
             
-            # Post to platforms
-            twitter_success = post_tweet(generated_text)
-            reddit_success = post_reddit(generated_text)
-            
-            if twitter_success and reddit_success:
-                log_execution("✅ Successfully posted to both Twitter and Reddit")
-            elif twitter_success:
-                log_execution("⚠️ Posted to Twitter but failed on Reddit")
-            elif reddit_success:
-                log_execution("⚠️ Posted to Reddit but failed on Twitter")
+            # Refine for both platforms in one round-trip, then post
+            drafts = refine_text_for_platforms(generated_text)
+            for platform, error in drafts.errors.items():
+                log_execution(f"⚠️ Refinement for {platform} failed, using the generated text: {error}")
+
+            # Every registered platform at once; journaled, so a rerun after a crash only posts what is still missing
+            key, results = publish(drafts_for(drafts, generated_text), nonce=nonce)
+            for result in results.values():
+                log_execution(f"🧾 Post {key} {result.summary()}")
+            posted, earlier, failed = split_results(results)
+            if earlier:
+                log_execution(f"⚠️ Not posted again to {', '.join(earlier)}: this draft already went out earlier")
+
+            if not posted and not failed:
+                log_execution("⚠️ Nothing new was posted this run")
+            elif not failed:
+                log_execution(f"✅ Successfully posted to {', '.join(posted)}")
+            elif posted:
+                log_execution(f"⚠️ Posted to {', '.join(posted)} but failed on {', '.join(failed)}")
             else:
-                log_execution("❌ Failed to post to both platforms")
+                log_execution(f"❌ Failed to post to {', '.join(failed)}")
+            return results
                 
         else:
             log_execution("❌ Failed to generate content with AI")
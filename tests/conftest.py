@@ -0,0 +1,11 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The bot's modules live flat in the repository root.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Keep the journal, draft buffer and feed caches away from the real .cache
+os.environ["BOT_CACHE_DIR"] = tempfile.mkdtemp(prefix="bot-cache-")
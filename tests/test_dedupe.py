@@ -0,0 +1,72 @@
+# tests/test_dedupe.py
+import random
+
+import pytest
+
+from scraper import dedupe
+from scraper.dedupe import DEFAULT_THRESHOLD, cluster_entries, similarity
+
+# The same story from different outlets
+SAME_STORY = [
+    ("Nvidia tops $4 trillion market value", "Nvidia tops $4 trillion in market value"),
+    ("Google releases Gemini 2.5 Pro", "Google releases Gemini 2.5 Pro model"),
+    ("Apple to acquire Perplexity for $14 billion, report says", "Apple in talks to acquire Perplexity for $14B"),
+    ("Microsoft signs $10 billion AI cloud deal with OpenAI", "OpenAI and Microsoft sign $10B cloud deal"),
+    ("Anthropic releases Claude 4", "Anthropic launches Claude 4 models"),
+    ("Meta Unveils Llama 4 Models", "Meta releases Llama 4"),
+    ("Mistral raises €600M in new funding round", "Mistral AI raises €600 million"),
+    ("Nvidia unveils Blackwell Ultra chips at GTC", "Nvidia Unveils Blackwell Ultra Chips At GTC"),
+]
+
+# Different stories about the same company or product
+DIFFERENT_STORIES = [
+    ("Meta releases Llama 3", "Meta releases Llama 4"),
+    ("Google releases Gemini 2.5 Pro", "Google releases Gemini 2.5 Flash"),
+    ("Nvidia unveils new AI chips", "AMD unveils new AI chips"),
+    ("Nvidia Unveils New AI Chips", "AMD Unveils New AI Chips"),
+    ("OpenAI raises $6.6 billion", "Anthropic raises $4 billion"),
+    ("Microsoft lays off 6,000 workers", "Microsoft lays off 9,000 workers"),
+    ("Bitcoin hits record high", "Bitcoin hits record low"),
+    ("OpenAI launches GPT-5", "OpenAI delays GPT-5 launch"),
+]
+
+
+def _entry(title, n):
+    return {"title": title, "url": f"https://example.com/{n}", "summary": f"Summary {n} in the outlet's own words."}
+
+
+@pytest.mark.parametrize("first, second", SAME_STORY)
+def test_rewordings_of_one_story_merge(first, second):
+    assert similarity({"title": first}, {"title": second}) >= DEFAULT_THRESHOLD
+    kept = cluster_entries([_entry(first, 1), _entry(second, 2)])
+    assert len(kept) == 1
+    assert kept[0]["url"] == "https://example.com/1"
+    assert kept[0]["duplicates"] == ["https://example.com/2"]
+
+
+@pytest.mark.parametrize("first, second", DIFFERENT_STORIES)
+def test_different_stories_stay_apart(first, second):
+    assert similarity({"title": first}, {"title": second}) < DEFAULT_THRESHOLD
+    assert len(cluster_entries([_entry(first, 1), _entry(second, 2)])) == 2
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_clusters_many_entries(monkeypatch, use_numpy):
+    if use_numpy and dedupe.np is None:
+        pytest.skip("numpy is not installed")
+    if not use_numpy:
+        monkeypatch.setattr(dedupe, "np", None)
+    rng = random.Random(7)
+    vocabulary = [f"word{i}" for i in range(2000)]
+    entries = [_entry(" ".join(rng.sample(vocabulary, 8)), i) for i in range(3000)]
+    # Each headline once (ignoring case), so only the SAME_STORY pairs merge
+    pairs, used = [], set()
+    for pair in SAME_STORY + DIFFERENT_STORIES:
+        if not used & {title.lower() for title in pair}:
+            pairs.append(pair)
+            used |= {title.lower() for title in pair}
+    for n, (first, second) in enumerate(pairs):
+        entries += [_entry(first, f"a{n}"), _entry(second, f"b{n}")]
+
+    kept = cluster_entries(entries)
+    assert len(kept) == len(entries) - len(SAME_STORY)
@@ -0,0 +1,53 @@
+# tests/test_feed_cache.py
+import json
+import os
+from pathlib import Path
+
+from scraper.enrich import ArticleCache, enrich_article
+from scraper.feed_cache import FeedCache
+
+URL = "https://example.com/feed"
+
+
+def _entries():
+    return [{"title": "Nvidia tops $4 trillion market value", "url": "https://example.com/a"}]
+
+
+def test_store_and_hits_do_not_share_entries_with_callers(tmp_path):
+    cache = FeedCache(tmp_path / "feeds.json")
+    entries = _entries()
+    cache.store(URL, entries)
+    entries[0]["text"] = "changed by the caller after storing"
+
+    hit = cache.record_hit(URL)
+    assert hit == _entries()
+    hit[0]["summary"] = "changed by the caller after a hit"
+    assert cache.record_hit(URL) == _entries()
+
+
+def test_enriching_a_cached_entry_leaves_the_feed_cache_alone(tmp_path):
+    feeds = FeedCache(tmp_path / "feeds.json")
+    articles = ArticleCache(tmp_path / "articles")
+    articles.put("https://example.com/a", "hash-a", {"text": "Full article body.", "summary": "Short summary."})
+    feeds.store(URL, _entries())
+
+    article = feeds.record_hit(URL)[0]
+    enriched = enrich_article(article, articles)
+    assert enriched["summary"] == "Short summary."
+    assert "summary" not in article
+
+    feeds.store("https://example.com/other", [])  # writes the file again
+    assert feeds.record_hit(URL) == _entries()
+    assert "Full article body." not in json.dumps(json.loads((tmp_path / "feeds.json").read_text()))
+
+
+def test_every_cache_lives_in_the_one_cache_dir():
+    import draft_buffer
+    import env_config
+    import publish_journal
+    from scraper import enrich, feed_cache, seen_index
+
+    assert env_config.CACHE_DIR == Path(os.environ["BOT_CACHE_DIR"])
+    for path in [publish_journal.DEFAULT_JOURNAL_PATH, draft_buffer.DEFAULT_BUFFER_PATH,
+                 feed_cache.DEFAULT_CACHE_PATH, seen_index.DEFAULT_INDEX_PATH, enrich.DEFAULT_ARTICLE_CACHE_DIR]:
+        assert path.parent == env_config.CACHE_DIR
@@ -0,0 +1,39 @@
+# tests/test_publish_queue.py
+import threading
+
+import pytest
+
+from publish_queue import NORMAL, URGENT, PublishQueue, at_priority
+
+
+@pytest.fixture
+def queue():
+    queue = PublishQueue(workers=1)
+    yield queue
+    queue.stop()
+
+
+def test_at_priority_puts_a_post_ahead_of_the_queued_ones(queue):
+    endpoint = "test.queue.priority"
+    started, release, order = threading.Event(), threading.Event(), []
+
+    def hold():
+        started.set()
+        release.wait(timeout=5)
+
+    blocker = queue.submit(endpoint, hold)  # keeps the only worker busy
+    assert started.wait(timeout=5)
+    scheduled = [queue.submit(endpoint, order.append, f"scheduled {n}") for n in range(3)]
+    with at_priority(URGENT):
+        urgent = queue.submit(endpoint, order.append, "urgent")
+        explicit = queue.submit(endpoint, order.append, "explicit normal", priority=NORMAL)
+
+    backlog = queue.drain_estimate()["endpoints"][endpoint]
+    assert backlog["pending"] == 5
+    assert backlog["seconds"] > 0
+
+    release.set()
+    for future in [blocker, urgent, explicit, *scheduled]:
+        future.result(timeout=5)
+    assert order == ["urgent", "scheduled 0", "scheduled 1", "scheduled 2", "explicit normal"]
+    assert queue.drain_estimate() == {"seconds": 0.0, "endpoints": {}}
@@ -0,0 +1,53 @@
+# tests/test_publisher.py
+import prawcore
+import pytest
+
+import publisher
+import resilience
+from publish_journal import FAILED, IN_DOUBT, PublishJournal
+
+
+class _RaisingPublisher(publisher.Publisher):
+    name = "testraise"
+
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def publish(self, text):
+        self.calls += 1
+        raise self.error
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = PublishJournal(tmp_path / "journal.jsonl")
+    yield journal
+    journal.close()
+
+
+def _publish_with(monkeypatch, journal, error):
+    plugin = _RaisingPublisher(error)
+    monkeypatch.setitem(publisher._registry, plugin.name, plugin)
+    key, results = publisher.publish({plugin.name: "hello"}, journal=journal)
+    return key, results[plugin.name], journal.entry(key)["legs"][plugin.name]
+
+
+@pytest.mark.parametrize("error", [
+    resilience.DeadlineExceeded("Deadline exceeded before the request was sent."),
+    prawcore.exceptions.RequestException(resilience.DeadlineExceeded("out of time"), ("POST",), {}),
+    resilience.NotSentError("missed its deadline in the queue"),
+])
+def test_a_post_that_never_went_out_fails_and_is_retried(monkeypatch, journal, error):
+    key, result, leg = _publish_with(monkeypatch, journal, error)
+    assert not result.ok
+    assert leg["status"] == FAILED
+    assert result.retryable
+    assert journal.missing_legs(key) == ["testraise"]
+
+
+def test_a_timeout_after_sending_stays_in_doubt(monkeypatch, journal):
+    key, result, leg = _publish_with(monkeypatch, journal, TimeoutError("read timed out"))
+    assert leg["status"] == IN_DOUBT
+    assert journal.missing_legs(key) == []
+    assert journal.missing_legs(key, retry_in_doubt=True) == ["testraise"]
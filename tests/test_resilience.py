@@ -0,0 +1,80 @@
+# tests/test_resilience.py
+import socket
+
+import prawcore
+import pytest
+import requests
+
+import resilience
+
+
+def _refused_connection_error():
+    """A real requests.ConnectionError from connecting to a port nobody listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    try:
+        requests.post(f"http://127.0.0.1:{port}/api/submit", timeout=2)
+    except requests.ConnectionError as e:
+        return e
+    pytest.skip(f"port {port} unexpectedly accepted a connection")
+
+
+def _prawcore_wrapped(error):
+    return prawcore.exceptions.RequestException(error, ("POST", "/api/submit"), {})
+
+
+def test_prawcore_wrapped_connection_error_is_a_provider_failure():
+    error = _prawcore_wrapped(_refused_connection_error())
+    assert resilience.is_provider_failure(error)
+    assert resilience.DEFAULT_POLICY.should_retry(error)
+    # Nothing was connected, so even a publish can safely try again
+    assert resilience.PUBLISH_POLICY.should_retry(error)
+
+
+def test_prawcore_wrapped_deadline_is_not_a_provider_failure():
+    error = _prawcore_wrapped(resilience.DeadlineExceeded("out of time"))
+    assert not resilience.is_provider_failure(error)
+    assert not resilience.PUBLISH_POLICY.should_retry(error)
+
+
+def test_status_code_is_read_through_the_cause():
+    response = requests.Response()
+    response.status_code = 503
+    try:
+        try:
+            raise requests.HTTPError(response=response)
+        except requests.HTTPError as inner:
+            raise RuntimeError("submit failed") from inner
+    except RuntimeError as outer:
+        assert resilience.status_code(outer) == 503
+
+
+def test_unreachable_reddit_is_retried_and_opens_the_breaker():
+    error = _prawcore_wrapped(_refused_connection_error())
+    calls = []
+
+    def submit():
+        calls.append(1)
+        raise error
+
+    endpoint = "test.reddit.submit.unreachable"
+    policy = resilience.RetryPolicy(max_attempts=3, base_delay=0.0, idempotent=False)
+    with pytest.raises(prawcore.exceptions.RequestException):
+        resilience.call(endpoint, submit, policy=policy)
+    assert len(calls) == 3
+    # The retries of the next publish run into the open breaker and stop early
+    with pytest.raises(resilience.CircuitOpenError):
+        resilience.call(endpoint, submit, policy=policy)
+    breaker = resilience.get_breaker(endpoint)
+    assert breaker.state == resilience.CircuitBreaker.OPEN
+    assert len(calls) == breaker.failure_threshold
+    with pytest.raises(resilience.CircuitOpenError):
+        resilience.call(endpoint, submit, policy=policy)
+    assert len(calls) == breaker.failure_threshold
+
+
+def test_connection_reset_after_sending_is_not_retried_for_publishing():
+    error = _prawcore_wrapped(requests.ConnectionError(ConnectionResetError("reset by peer")))
+    assert resilience.is_provider_failure(error)
+    assert not resilience.PUBLISH_POLICY.should_retry(error)
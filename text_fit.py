@@ -0,0 +1,245 @@
+# text_fit.py
+"""
+Local length checks and fitting for post drafts, so an over-long draft can be
+fixed in microseconds instead of with another Gemini round-trip.
+
+weighted_length() follows X's counting rules (twitter-text v3 config): text is
+NFC-normalized, most Latin/Greek/Cyrillic code points count 1, everything else
+(CJK, most symbols) counts 2, every URL counts 23 and an emoji sequence counts 2
+however many code points it is made of.
+
+fit_text() shortens a draft in this order until it fits:
+  1. trailing hashtags, last one first (keeping `min_hashtags`)
+  2. whole sentences from the end (the first sentence always stays)
+  3. the remaining trailing hashtags
+  4. truncation at a word boundary with an ellipsis
+Only step 4 loses meaning mid-sentence; FitResult.truncated tells callers when
+a fresh refinement would give a better result.
+
+split_thread() is the alternative for long content: numbered posts for a thread.
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+X_CHARACTER_LIMIT = 280
+X_URL_LENGTH = 23
+ELLIPSIS = "\u2026"
+
+# Code points outside these ranges count 2 on X.
+_HEAVY_CHAR_RE = re.compile("[^\u0000-\u10FF\u2000-\u200D\u2010-\u201F\u2032-\u2037]")
+
+_URL_RE = re.compile(
+    r"(?:https?://|www\.)[^\s<>\"]+"
+    r"|\b(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+"
+    r"(?:com|org|net|io|ai|dev|co|ly|gl|me|app|news|tech|edu|gov|info|us|uk)\b(?:/[^\s<>\"]*)?",
+    re.IGNORECASE,
+)
+_URL_TRAILING_PUNCT = ".,!?;:)'\""
+_DOTTED_TOKEN_RE = re.compile(r"\S*\.\S+")  # only these can contain a URL
+
+_EMOJI_BASE = "[\u2190-\u21FF\u2300-\u23FF\u2600-\u27BF\u2B00-\u2BFF\u3030\u303D\u3297\u3299\U0001F000-\U0001FAFF]"
+_EMOJI_MODIFIERS = "[\uFE0F\U0001F3FB-\U0001F3FF\U000E0020-\U000E007F]*"
+_EMOJI_RE = re.compile(
+    "[\U0001F1E6-\U0001F1FF]{2}"  # flags
+    "|[0-9#*]\uFE0F?\u20E3"  # keycaps
+    f"|{_EMOJI_BASE}{_EMOJI_MODIFIERS}(?:\u200D{_EMOJI_BASE}{_EMOJI_MODIFIERS})*"
+)
+
+_HASHTAG_RE = re.compile(r"(?<!\w)#\w+")
+_TRAILING_HASHTAGS_RE = re.compile(r"(?:\s*#\w+)+\s*$")
+# A sentence ends at . ! ? before whitespace (so URLs and 2.0 stay whole) or at a CJK full stop.
+_SENTENCE_RE = re.compile(r"\S.*?(?:[.!?]+(?=\s|$)|[\u3002\uFF01\uFF1F]+|$)", re.DOTALL)
+
+
+def _char_length(text):
+    if text.isascii():
+        return len(text)
+    return len(text) + len(_HEAVY_CHAR_RE.findall(text))
+
+
+def _url_spans(text):
+    for token in _DOTTED_TOKEN_RE.finditer(text):
+        for match in _URL_RE.finditer(text, token.start(), token.end()):
+            start, end = match.span()
+            while end > start and text[end - 1] in _URL_TRAILING_PUNCT:
+                end -= 1
+            if end > start:
+                yield start, end
+
+
+def weighted_length(text):
+    """Length of `text` as X counts it against the 280 limit."""
+    text = unicodedata.normalize("NFC", text)
+    length = 0
+    position = 0
+    for start, end in _url_spans(text):
+        length += _plain_length(text[position:start]) + X_URL_LENGTH
+        position = end
+    return length + _plain_length(text[position:])
+
+
+def _plain_length(text):
+    if text.isascii():
+        return len(text)
+    length = 0
+    position = 0
+    for match in _EMOJI_RE.finditer(text):
+        length += _char_length(text[position:match.start()]) + 2
+        position = match.end()
+    return length + _char_length(text[position:])
+
+
+def platform_length(text, platform):
+    """Length as `platform` counts it: weighted for X, plain characters elsewhere."""
+    return weighted_length(text) if platform == "twitter" else len(text)
+
+
+@dataclass
+class FitResult:
+    text: str
+    length: int
+    limit: int
+    changes: list = field(default_factory=list)  # human-readable steps taken
+    truncated: bool = False
+
+    @property
+    def fits(self):
+        return self.length <= self.limit
+
+    @property
+    def changed(self):
+        return bool(self.changes)
+
+
+def _split_body(text):
+    """(body, trailing hashtags) - the hashtag block at the end of the draft."""
+    match = _TRAILING_HASHTAGS_RE.search(text)
+    if not match or match.start() == 0:
+        return text.rstrip(), []
+    return text[:match.start()].rstrip(), _HASHTAG_RE.findall(match.group())
+
+
+def _join(body, hashtags):
+    return f"{body} {' '.join(hashtags)}" if hashtags else body
+
+
+def _truncate(text, limit, length):
+    if length(ELLIPSIS) > limit:
+        return ""
+    words = text.split(" ")
+    while words:
+        candidate = " ".join(words).rstrip(" ,;:-") + ELLIPSIS
+        if length(candidate) <= limit:
+            return candidate
+        words.pop()
+    # A single word longer than the limit: cut it by characters.
+    cut = text
+    while cut and length(cut + ELLIPSIS) > limit:
+        cut = cut[:-1]
+    return cut + ELLIPSIS
+
+
+def fit_text(text, limit=X_CHARACTER_LIMIT, length=weighted_length, min_hashtags=1):
+    """
+    Deterministically shortens `text` to at most `limit` as measured by `length`.
+    Each sentence and hashtag is measured once; `length` must add up over
+    space-joined pieces, which len and weighted_length do.
+    """
+    text = re.sub(r"[ \t]+", " ", unicodedata.normalize("NFC", text)).strip()
+    result = FitResult(text, length(text), limit)
+    if result.fits:
+        return result
+
+    body, hashtags = _split_body(text)
+    sentences = [s.strip() for s in _SENTENCE_RE.findall(body) if s.strip()] or [body]
+    sentence_lengths = [length(s) for s in sentences]
+    tag_lengths = [length(tag) + 1 for tag in hashtags]  # +1 for the joining space
+
+    def total():
+        return sum(sentence_lengths) + len(sentences) - 1 + sum(tag_lengths)
+
+    while len(hashtags) > min_hashtags and total() > limit:
+        tag_lengths.pop()
+        result.changes.append(f"dropped {hashtags.pop()}")
+
+    if len(sentences) > 1 and total() > limit:
+        while len(sentences) > 1 and total() > limit:
+            sentences.pop()
+            sentence_lengths.pop()
+            result.changes.append("dropped a sentence")
+        body = " ".join(sentences)
+
+    while hashtags and total() > limit:
+        tag_lengths.pop()
+        result.changes.append(f"dropped {hashtags.pop()}")
+
+    text = _join(body, hashtags)
+    if length(text) > limit:
+        text = _truncate(text, limit, length)
+        result.changes.append("truncated")
+        result.truncated = True
+
+    result.text = text
+    result.length = length(text)
+    return result
+
+
+def fit_for_platform(text, platform, limit, **kwargs):
+    return fit_text(text, limit, length=lambda t: platform_length(t, platform), **kwargs)
+
+
+def _thread_pieces(text, budget, length):
+    """Sentences of `text`; a sentence over `budget` is split at words, a word over it by characters."""
+    pieces = []
+    for sentence in (s.strip() for s in _SENTENCE_RE.findall(text)):
+        if not sentence:
+            continue
+        if length(sentence) <= budget:
+            pieces.append(sentence)
+            continue
+        for word in sentence.split():
+            while length(word) > budget:
+                cut = budget
+                while cut > 1 and length(word[:cut]) > budget:
+                    cut -= 1
+                pieces.append(word[:cut])
+                word = word[cut:]
+            if word:
+                pieces.append(word)
+    return pieces
+
+
+def _pack(pieces, budget, length):
+    chunks = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current} {piece}" if current else piece
+        if length(candidate) <= budget:
+            current = candidate
+        else:
+            chunks.append(current)
+            current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_thread(text, limit=X_CHARACTER_LIMIT, length=weighted_length, numbered=True):
+    """
+    Splits `text` into posts of at most `limit`, breaking at sentence boundaries
+    where possible. With `numbered`, each post of a multi-post thread ends in " i/n".
+    """
+    text = re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+    if length(text) <= limit:
+        return [text] if text else []
+    digits = 1
+    while True:
+        reserve = len(f" {'9' * digits}/{'9' * digits}") if numbered else 0
+        chunks = _pack(_thread_pieces(text, limit - reserve, length), limit - reserve, length)
+        if not numbered:
+            return chunks
+        if len(str(len(chunks))) <= digits:
+            return [f"{chunk} {i}/{len(chunks)}" for i, chunk in enumerate(chunks, 1)]
+        digits = len(str(len(chunks)))
@@ -1,50 +1,240 @@
-import os
+import threading
+from dataclasses import dataclass, field
+
 import tweepy
-from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
-def post_tweet(text_to_post):
+import resilience
+from env_config import get_env
+from rate_limit import get_rate_state
+from publish_queue import get_default_queue
+from publisher import Publisher, register
+from text_fit import X_CHARACTER_LIMIT, fit_for_platform, split_thread
+
+X_API_HOST = "https://api.twitter.com"
+X_POOL_CONNECTIONS = 4
+X_POOL_MAXSIZE = 16  # keep-alive connections per host, enough for concurrent posting
+X_BATCH_WORKERS = 4
+X_TIMEOUT = 30  # seconds per request, shortened by any resilience.deadline()
+
+
+class MissingCredentialsError(ValueError):
+    pass
+
+
+class _RedirectAdapter(HTTPAdapter):
+    """Sends requests meant for the X API to `base_url` instead (tweepy hard-codes the host)."""
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url.rstrip("/")
+
+    def send(self, request, **kwargs):
+        if request.url.startswith(X_API_HOST):
+            request.url = self.base_url + request.url[len(X_API_HOST):]
+        return super().send(request, **kwargs)
+
+
+def _record_rate_limit(response, *args, **kwargs):
+    """requests response hook: keeps the create-tweet quota from X's headers."""
+    if response.request.method == "POST" and response.request.path_url.split("?")[0] == "/2/tweets":
+        get_rate_state("x.create_tweet").update_from_headers(response.headers)
+
+
+def _read_credentials():
+    credentials = (
+        get_env("API_KEY"),
+        get_env("API_KEY_SECRET"),
+        get_env("ACCESS_TOKEN"),
+        get_env("ACCESS_TOKEN_SECRET"),
+        get_env("X_API_BASE_URL"),  # optional, e.g. the load-test fakes in fake_services.py
+    )
+    if not all(credentials[:4]):
+        raise MissingCredentialsError("Missing one or more API credentials in the .env file.")
+    return credentials
+
+
+class TwitterClientHolder:
     """
-    Authenticates with the X API using credentials from .env
-    and posts a tweet.
+    Process-wide tweepy.Client shared by the GUI, the scheduler and the task
+    runner, so consecutive posts reuse warm keep-alive connections. The client
+    is rebuilt when the credentials in .env change or after an auth error.
     """
-    # Load environment variables from .env file
-    load_dotenv()
 
-    # Get credentials from environment variables
-    api_key = os.getenv("API_KEY")
-    api_key_secret = os.getenv("API_KEY_SECRET")
-    access_token = os.getenv("ACCESS_TOKEN")
-    access_token_secret = os.getenv("ACCESS_TOKEN_SECRET")
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._credentials = None
+        self._client = None
 
-    # Check if all keys are present
-    if not all([api_key, api_key_secret, access_token, access_token_secret]):
-        print("🔴 Error: Missing one or more API credentials in the .env file.")
-        return
+    def get(self):
+        credentials = _read_credentials()
+        with self._lock:
+            if credentials != self._credentials:
+                self._client = self._build(credentials)
+                self._credentials = credentials
+            return self._client
 
-    try:
-        # Authenticate using the X API v2 client
+    @staticmethod
+    def _build(credentials):
+        api_key, api_key_secret, access_token, access_token_secret, base_url = credentials
         client = tweepy.Client(
             consumer_key=api_key,
             consumer_secret=api_key_secret,
             access_token=access_token,
             access_token_secret=access_token_secret
         )
+        client.session = resilience.DeadlineSession(X_TIMEOUT)
+        if base_url:
+            adapter = _RedirectAdapter(base_url, pool_connections=X_POOL_CONNECTIONS, pool_maxsize=X_POOL_MAXSIZE)
+        else:
+            adapter = HTTPAdapter(pool_connections=X_POOL_CONNECTIONS, pool_maxsize=X_POOL_MAXSIZE)
+        client.session.mount(X_API_HOST, adapter)
+        client.session.hooks["response"].append(_record_rate_limit)
+        return client
+
+    def invalidate(self):
+        """Drops the client; returns True if the credentials changed since it was built."""
+        with self._lock:
+            stale = self._credentials
+            self._credentials = None
+            self._client = None
+        try:
+            return _read_credentials() != stale
+        except MissingCredentialsError:
+            return False
+
+
+_clients = TwitterClientHolder()
+
+
+def get_client():
+    return _clients.get()
+
+
+def _create_tweet(text_to_post, **params):
+    try:
+        return resilience.call("x.create_tweet", get_client().create_tweet, text=text_to_post,
+                               policy=resilience.PUBLISH_POLICY, **params)
+    except tweepy.errors.Unauthorized:
+        # Rotated credentials or a revoked token: rebuild, and retry once if .env has new keys.
+        if not _clients.invalidate():
+            raise
+        print("🟡 X credentials changed, retrying with the new ones...")
+        return resilience.call("x.create_tweet", get_client().create_tweet, text=text_to_post,
+                               policy=resilience.PUBLISH_POLICY, **params)
+
+
+def _queue_create_tweet(text_to_post, **params):
+    """Queues a post behind the quota X reports in its headers; returns the Future of _create_tweet()."""
+    return get_default_queue().submit("x.create_tweet", _create_tweet, text_to_post, **params)
+
 
+def post_tweet(text_to_post):
+    """
+    Posts a tweet with the shared X API client and returns its id.
+    Credentials come from .env.
+    """
+    try:
         # Create the tweet
         print("🔵 Attempting to post tweet...")
-        response = client.create_tweet(text=text_to_post)
-        
+        response = _create_tweet(text_to_post)
+
         tweet_id = response.data['id']
         tweet_text = response.data['text']
-        
+
         print("✅ Tweet posted successfully!")
         print(f"   ID: {tweet_id}")
         print(f"   Text: \"{tweet_text[:60]}...\"")
         print(f"   View it here: https://twitter.com/user/status/{tweet_id}")
+        return tweet_id
 
+    except MissingCredentialsError as e:
+        print(f"🔴 Error: {e}")
+        return None
     except tweepy.errors.TweepyException as e:
         print(f"🔴 Error posting tweet: {e}")
         raise e
     except Exception as e:
         print(f"🔴 An unexpected error occurred: {e}")
-        raise e
\ No newline at end of file
+        raise e
+
+
+@dataclass
+class ThreadResult:
+    """A thread's posts and the ids of those posted so far; pass it back to post_thread() to resume."""
+    chunks: list
+    tweet_ids: list = field(default_factory=list)
+    error: str = None
+
+    @property
+    def complete(self):
+        return len(self.tweet_ids) == len(self.chunks)
+
+    @property
+    def url(self):
+        return f"https://twitter.com/user/status/{self.tweet_ids[0]}" if self.tweet_ids else None
+
+
+def post_thread(text=None, resume=None, in_reply_to=None):
+    """
+    Posts `text` as a reply chain, split at sentence boundaries into numbered
+    posts that each fit X's weighted limit. A failure stops the chain and is
+    reported in ThreadResult.error; post_thread(resume=result) continues from
+    the last tweet that went out instead of starting over.
+    """
+    if text is None and resume is None:
+        raise ValueError("post_thread() needs the text to post or a ThreadResult to resume.")
+    result = resume or ThreadResult(split_thread(text))
+    result.error = None
+    previous = result.tweet_ids[-1] if result.tweet_ids else in_reply_to
+    print(f"🔵 Posting thread: {len(result.chunks) - len(result.tweet_ids)} of {len(result.chunks)} tweets to go...")
+    for chunk in result.chunks[len(result.tweet_ids):]:
+        params = {"in_reply_to_tweet_id": previous} if previous else {}
+        try:
+            response = _queue_create_tweet(chunk, **params).result()
+        except Exception as e:  # keep what was posted so the thread can be resumed
+            result.error = str(e)
+            print(f"🔴 Thread stopped after {len(result.tweet_ids)} tweets: {e}")
+            break
+        previous = response.data['id']
+        result.tweet_ids.append(previous)
+    if result.complete:
+        print(f"✅ Thread posted: {result.url}")
+    return result
+
+
+def post_tweets(texts):
+    """
+    Posts many independent tweets. They go out concurrently through the publish
+    queue as fast as X's reported quota allows. Returns one result per text, in
+    order: the tweet id, or the exception for a failed post.
+    """
+    futures = [_queue_create_tweet(text) for text in texts]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result().data['id'])
+        except Exception as e:
+            results.append(e)
+    posted = sum(not isinstance(r, Exception) for r in results)
+    print(f"✅ Posted {posted} of {len(results)} tweets.")
+    return results
+
+
+class TwitterPublisher(Publisher):
+    name = "twitter"
+    max_concurrency = X_BATCH_WORKERS
+    timeout = X_TIMEOUT
+
+    def format(self, text):
+        return fit_for_platform(text, "twitter", X_CHARACTER_LIMIT).text
+
+    def publish(self, text):
+        # Through the publish queue, which holds the post until X reports quota for it
+        return get_default_queue().submit("x.create_tweet", post_tweet, text).result()
+
+    def url(self, ref):
+        return f"https://twitter.com/user/status/{ref}"
+
+
+register(TwitterPublisher())